@@ -0,0 +1,84 @@
+"""Compare the ranking quality of the centroid-only and hub-quality mixed pools.
+
+The mixed pool is a quality change: it trades centroid neighbours for hubs
+the roster reaches well, which raises the 10th-best score on most rosters.
+It is not meant to be faster. A cold evaluation is dominated by per-origin
+reachability searches and origin-tree builds, which do not depend on the
+pool, so the smaller pool leaves evaluation time about the same. Timings
+are printed only to show that. Every evaluation starts from cold engine
+caches, so neither pool benefits from routes the other one searched.
+
+Run from the project root:  python benchmarks/bench_candidates.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import backend, hubs  # noqa: E402
+
+_ENGINE_CACHES = (
+    "_ROUTE_DETAIL_CACHE",
+    "_REACHABLE_CACHE",
+    "_COLLECT_REACHABLE_CACHE",
+    "_EDGE_ARRAY_CACHE",
+    "_ORIGIN_TREE_CACHE",
+    "_RESULT_CACHE",
+)
+
+
+def _rosters(dataset, count, seed):
+    rng = random.Random(seed)
+    popular = hubs.TopHubs(dataset["hubs"], 300)
+    routed = sorted(code for code in dataset["direct"] if code in dataset["airports"])
+    rosters = []
+    for _ in range(count):
+        size = rng.randint(3, 25)
+        codes = {rng.choice(popular) if rng.random() < 0.7 else rng.choice(routed) for _ in range(size)}
+        rosters.append(sorted(codes))
+    return rosters
+
+
+def _evaluate(roster, dataset, hub_index):
+    for cache in _ENGINE_CACHES:
+        getattr(backend, cache).clear()
+    start = time.perf_counter()
+    rows, meta = backend.EvaluateCandidatesRouteAware(
+        roster, dataset["airports"], dataset["direct"], dataset["inbound"], hub_index=hub_index
+    )
+    return rows, len(meta["evaluation"]["metrics"]["codes"]), time.perf_counter() - start
+
+
+def main(count=30, seed=11):
+    dataset = backend._get_dataset()
+    rosters = _rosters(dataset, count, seed)
+    totals = {"old_pool": 0, "new_pool": 0, "old_time": 0.0, "new_time": 0.0, "overlap": 0, "better": 0, "worse": 0}
+    for roster in rosters:
+        old_rows, old_pool, old_time = _evaluate(roster, dataset, None)
+        new_rows, new_pool, new_time = _evaluate(roster, dataset, dataset["hubs"])
+        old_top = [row[0] for row in old_rows[:10]]
+        new_top = [row[0] for row in new_rows[:10]]
+        totals["old_pool"] += old_pool
+        totals["new_pool"] += new_pool
+        totals["old_time"] += old_time
+        totals["new_time"] += new_time
+        totals["overlap"] += len(set(old_top) & set(new_top))
+        old_tenth = old_rows[min(9, len(old_rows) - 1)][2] if old_rows else 0.0
+        new_tenth = new_rows[min(9, len(new_rows) - 1)][2] if new_rows else 0.0
+        totals["better"] += new_tenth > old_tenth
+        totals["worse"] += new_tenth < old_tenth
+    print(f"rosters: {len(rosters)}")
+    print(f"mean pool size: centroid {totals['old_pool'] / len(rosters):.0f}, "
+          f"mixed {totals['new_pool'] / len(rosters):.0f}")
+    print(f"mean top-10 overlap: {totals['overlap'] / len(rosters):.1f}")
+    print(f"10th-best score with the mixed pool: better {totals['better']}, worse {totals['worse']}, "
+          f"equal {len(rosters) - totals['better'] - totals['worse']}")
+    print(f"evaluation time (pool-independent): centroid {totals['old_time']:.2f}s, "
+          f"mixed {totals['new_time']:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
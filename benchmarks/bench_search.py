@@ -0,0 +1,70 @@
+"""Compare uniform-cost and A* route search on hub-heavy origin/destination pairs.
+
+Run from the project root:  python benchmarks/bench_search.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import backend  # noqa: E402
+
+HUBS = ["FRA", "ATL", "LHR", "CDG", "DXB", "ORD", "AMS", "IST", "PEK", "DFW"]
+
+
+def _pairs(airports, direct, count, seed):
+    rng = random.Random(seed)
+    routed = sorted(code for code in direct if code in airports)
+    pairs = []
+    for hub in HUBS:
+        for _ in range(count):
+            other = rng.choice(routed)
+            pairs.append((hub, other) if rng.random() < 0.5 else (other, hub))
+    return pairs
+
+
+def _run(pairs, airports, direct, inbound, astar):
+    backend.get_search_stats(reset=True)
+    results = []
+    start = time.perf_counter()
+    for origin, dest in pairs:
+        results.append(
+            backend._search_best_route(origin, dest, airports, direct, inbound, backend._MAX_ALLOWED_STOPS, astar=astar)
+        )
+    elapsed = time.perf_counter() - start
+    return results, elapsed, backend.get_search_stats(reset=True)
+
+
+def _same(a, b):
+    if a is None or b is None:
+        return a is b
+    return a.path == b.path and a.availability == b.availability and abs(a.time - b.time) < 1e-6
+
+
+def main(count=20, seed=7):
+    dataset = backend._get_dataset()
+    airports, direct, inbound = dataset["airports"], dataset["direct"], dataset["inbound"]
+    pairs = _pairs(airports, direct, count, seed)
+    # Warm the reachability caches so both modes pay the same setup cost
+    _run(pairs, airports, direct, inbound, astar=True)
+
+    baseline, base_time, base_stats = _run(pairs, airports, direct, inbound, astar=False)
+    astar, astar_time, astar_stats = _run(pairs, airports, direct, inbound, astar=True)
+
+    mismatches = [pair for pair, a, b in zip(pairs, baseline, astar) if not _same(a, b)]
+    print(f"pairs: {len(pairs)}")
+    print(f"uniform-cost: {base_time:.2f}s, {base_stats['pushes']} pushes, {base_stats['pops']} pops")
+    print(f"A*:           {astar_time:.2f}s, {astar_stats['pushes']} pushes, {astar_stats['pops']} pops")
+    if astar_stats["pushes"]:
+        print(f"push reduction: {base_stats['pushes'] / astar_stats['pushes']:.1f}x, "
+              f"speedup: {base_time / astar_time:.1f}x")
+    print(f"mismatches: {len(mismatches)}")
+    for origin, dest in mismatches[:10]:
+        print(f"  {origin} -> {dest}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,403 @@
+"""Differential check of route-engine variants against a reference oracle.
+
+The oracle answers every route with _baseline_search, a copy of the
+original uniform-cost search kept in this file (extended only with the
+carrier, stop-limit and layover options), in place of the engine's
+_search_best_route; A*, origin trees and the hub matrix are off. Every
+variant must reproduce its route details (path, availability, time) and
+the full ranking of EvaluateCandidatesRouteAware for random and
+adversarial origin/destination pairs and rosters drawn from assets/,
+including 3- and 4-stop limits, carrier restrictions, metro-area
+departures, arrival deadlines and request deadlines.
+
+Run from the project root:
+    python benchmarks/differential.py                 # every variant against the live oracle
+    python benchmarks/differential.py --record FILE   # freeze the oracle's outputs to FILE
+    python benchmarks/differential.py --check FILE    # compare the current engine with FILE
+
+The oracle needs a quarter of an hour or more for the rosters, so record it once and use --check
+(optionally with --variant) while iterating. To test a new engine, add its
+backend switches to VARIANTS.
+"""
+import argparse
+import contextlib
+import heapq
+import json
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import backend, carriers, hubs, scoring  # noqa: E402
+from modules.records import RouteDetail, RouteSegment  # noqa: E402
+
+
+def _baseline_reachable(dest, inbound_routes, max_stops):
+    # Airports with a path of at most max_stops + 1 legs to dest
+    reachable = set()
+    visited = {dest}
+    frontier = {dest}
+    for _ in range(max_stops + 1):
+        next_frontier = set()
+        for airport in frontier:
+            for src in inbound_routes.get(airport, {}):
+                if src not in visited:
+                    visited.add(src)
+                    reachable.add(src)
+                    next_frontier.add(src)
+        frontier = next_frontier
+    return reachable
+
+
+def _baseline_search(origin, dest, airports, direct_routes, inbound_routes, max_stops,
+                     carrier_mask=None, same_carrier=False, astar=None, layover_minutes=None):
+    """The original uniform-cost route search, with the engine's routing options.
+
+    Drop-in for backend._search_best_route; `astar` is ignored.
+    """
+    if layover_minutes is None:
+        layover_minutes = backend._LAYOVER_MINUTES
+    reachable = _baseline_reachable(dest, inbound_routes, max_stops)
+    if origin != dest and origin not in reachable and direct_routes.get(origin, {}).get(dest) is None:
+        return None
+
+    initial_carriers = -1 if carrier_mask is None else carrier_mask
+    heap = [(0.0, 0.0, 0.0, [origin], [], 0.0, initial_carriers)]
+    visited = {}
+
+    while heap:
+        total_time, total_distance, total_co2, path, segments, layovers, legal = heapq.heappop(heap)
+        current = path[-1]
+        legs = len(path) - 1
+        state_key = (current, legs, legal) if same_carrier else (current, legs)
+        best_seen = visited.get(state_key)
+        if best_seen is not None and total_time >= best_seen - 1e-6:
+            continue
+        visited[state_key] = total_time
+
+        if current == dest and legs > 0:
+            stops = len(path) - 2
+            if stops <= max_stops:
+                ground_only = all(segment.airlines == 0 for segment in segments)
+                airlines = sum(segment.airlines for segment in segments) / len(segments)
+                return RouteDetail(
+                    "ground" if ground_only else scoring.STOP_AVAILABILITY[stops],
+                    len(segments),
+                    stops,
+                    tuple(path),
+                    tuple(segments),
+                    total_distance,
+                    total_time,
+                    total_co2,
+                    round(airlines, 3),
+                    layover_minutes=layovers,
+                )
+            continue
+
+        if legs >= max_stops + 1:
+            continue
+
+        for nxt, info in direct_routes.get(current, {}).items():
+            if nxt in path:
+                continue
+            if nxt != dest and nxt not in reachable:
+                continue
+            if info["distance"] is None:
+                continue
+            next_legal = legal
+            if (carrier_mask is not None or same_carrier) and info.get("mode") != "ground":
+                carriers_here = info["mask"] if carrier_mask is None else info["mask"] & carrier_mask
+                if same_carrier:
+                    carriers_here &= legal
+                if not carriers_here:
+                    continue
+                if same_carrier:
+                    next_legal = carriers_here
+            if carrier_mask is not None:
+                airlines = bin(info["mask"] & carrier_mask).count("1")
+            else:
+                airlines = len(info.get("airlines", ())) if info.get("airlines") else 0
+            layover_time = layover_minutes if len(path) > 1 else 0.0
+            heapq.heappush(heap, (
+                total_time + layover_time + info["time"],
+                total_distance + info["distance"],
+                total_co2 + info["co2"],
+                path + [nxt],
+                segments + [RouteSegment(current, nxt, info["distance"], info["time"], airlines)],
+                layovers + layover_time,
+                next_legal,
+            ))
+    return None
+
+
+REFERENCE = {
+    "_USE_ASTAR": False,
+    "_USE_ORIGIN_TREES": False,
+    "_USE_HUB_MATRIX": False,
+    "_search_best_route": _baseline_search,
+}
+# Backend module switches that select each engine variant
+VARIANTS = {
+    "astar": {"_USE_ASTAR": True, "_USE_ORIGIN_TREES": False, "_USE_HUB_MATRIX": False},
+    "trees": {"_USE_ASTAR": True, "_USE_ORIGIN_TREES": True, "_USE_HUB_MATRIX": False},
+    # Needs `python main.py --build-hub-matrix`; otherwise identical to "trees"
+    "hub_matrix": {"_USE_ASTAR": True, "_USE_ORIGIN_TREES": True, "_USE_HUB_MATRIX": True},
+}
+_TIME_EPSILON = 1e-6
+_SCORE_EPSILON = 1e-9
+_ENGINE_CACHES = (
+    "_ROUTE_DETAIL_CACHE",
+    "_REACHABLE_CACHE",
+    "_COLLECT_REACHABLE_CACHE",
+    "_EDGE_ARRAY_CACHE",
+    "_ORIGIN_TREE_CACHE",
+    "_RESULT_CACHE",
+)
+
+
+@contextlib.contextmanager
+def _engine(settings):
+    # Switch the backend to one engine with cold caches, then restore it
+    saved = {name: getattr(backend, name) for name in settings}
+    for cache in _ENGINE_CACHES:
+        getattr(backend, cache).clear()
+    for name, value in settings.items():
+        setattr(backend, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(backend, name, value)
+        for cache in _ENGINE_CACHES:
+            getattr(backend, cache).clear()
+
+
+def _routings(dataset, rng):
+    # Stop limits, alliance masks and same-carrier requests, mostly defaults
+    alliance = rng.choice(sorted(carriers.ALLIANCES))
+    mask = carriers.CarrierMask(dataset["airline_ids"], alliance=alliance)
+    roll = rng.random()
+    if roll < 0.55:
+        return None
+    if roll < 0.7:
+        return {"carrier_mask": None, "same_carrier": False, "max_stops": rng.choice((0, 1, 3, 4))}
+    if roll < 0.9:
+        return {"carrier_mask": mask, "same_carrier": False, "max_stops": 2}
+    return {"carrier_mask": mask, "same_carrier": True, "max_stops": 2}
+
+
+def _roster_options(dataset, rng, position):
+    # Routing and request options, cycling through every evaluation feature
+    kind = position % 6
+    routing, options = None, {"metro": False, "arrive_by": None, "deadline": None}
+    if kind in (1, 2):
+        routing = {"carrier_mask": None, "same_carrier": False, "max_stops": 2 + kind}
+    elif kind == 3:
+        while routing is None or routing["max_stops"] != 2:
+            routing = _routings(dataset, rng)
+    elif kind == 4:
+        options["metro"] = True
+    elif kind == 5:
+        # Long enough never to expire, so the promise-ordered search must finish
+        options["deadline"] = 3600.0
+        options["arrive_by"] = rng.choice(("Mon 09:00", "Tue 14:30", "Fri 18:00"))
+    return routing, options
+
+
+def _cases(dataset, pair_count, roster_count, seed):
+    """Random and adversarial (origin, dest, routing) pairs and (roster, routing, options) evaluations."""
+    rng = random.Random(seed)
+    airports, direct = dataset["airports"], dataset["direct"]
+    routed = sorted(code for code in direct if code in airports)
+    popular = hubs.TopHubs(dataset["hubs"], 200)
+    # Adversarial endpoints: a single route out, no routes at all, and far-apart pairs
+    remote = [code for code in routed if len(direct[code]) == 1]
+    unrouted = sorted(code for code in airports if code not in direct)[:50]
+
+    def _far(code):
+        info = airports[code]
+        antipode = (-info["lat"], info["lon"] + 180.0 if info["lon"] <= 0 else info["lon"] - 180.0)
+        sample = rng.sample(routed, 200)
+        return min(sample, key=lambda other: math.hypot(airports[other]["lat"] - antipode[0],
+                                                         airports[other]["lon"] - antipode[1]))
+
+    pairs = []
+    for position in range(pair_count):
+        kind = position % 6
+        if kind == 0:
+            origin, dest = rng.choice(routed), rng.choice(routed)
+        elif kind == 1:
+            origin, dest = rng.choice(popular), rng.choice(popular)
+        elif kind == 2:
+            origin, dest = rng.choice(remote), rng.choice(remote if rng.random() < 0.5 else popular)
+        elif kind == 3:
+            origin = rng.choice(popular)
+            dest = _far(origin)
+        elif kind == 4:
+            origin = rng.choice(routed)
+            dest = rng.choice(unrouted) if unrouted and rng.random() < 0.5 else origin
+        else:
+            origin, dest = rng.choice(popular), rng.choice(routed)
+        pairs.append((origin, dest, _routings(dataset, rng)))
+
+    rosters = []
+    for position in range(roster_count):
+        kind = position % 4
+        routing, options = _roster_options(dataset, rng, position)
+        # Deep stop limits make the oracle slow, so keep those rosters small
+        size = rng.randint(2, 6 if routing and routing["max_stops"] > 2 else 25)
+        if kind == 0:
+            roster = [rng.choice(routed) for _ in range(size)]
+        elif kind == 1:
+            roster = [rng.choice(popular) for _ in range(size)]
+        elif kind == 2:
+            # Everyone from one or two airports, so weights and "same" routes dominate
+            roster = [rng.choice(popular)] * size + [rng.choice(routed)]
+        else:
+            anchor = rng.choice(popular)
+            roster = [anchor, _far(anchor), rng.choice(remote)] + [rng.choice(routed) for _ in range(size)]
+        rosters.append((roster, routing, options))
+    return pairs, rosters
+
+
+def _route_record(detail):
+    return {"path": list(detail.path), "availability": detail.availability, "time": detail.time}
+
+
+def _run(pairs, rosters, dataset):
+    """Route records, rankings and timings of the currently selected engine."""
+    airports, direct, inbound = dataset["airports"], dataset["direct"], dataset["inbound"]
+    started = time.perf_counter()
+    routes = [
+        _route_record(backend._compute_route_detail(origin, dest, airports, direct, inbound, routing))
+        for origin, dest, routing in pairs
+    ]
+    route_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    rankings = []
+    for roster, routing, options in rosters:
+        deadline = time.monotonic() + options["deadline"] if options["deadline"] else None
+        rows, meta = backend.EvaluateCandidatesRouteAware(
+            roster, airports, direct, inbound, routing=routing, hub_index=dataset["hubs"],
+            hub_matrix=dataset["hub_matrix"], timetable=dataset["timetable"], arrive_by=options["arrive_by"],
+            metro_areas=dataset["metros"] if options["metro"] else None, deadline=deadline,
+        )
+        evaluation = meta["evaluation"]
+        cells = {
+            f"{origin}>{code}": _route_record(evaluation["routes"][index][origin])
+            for index, code in enumerate(evaluation["metrics"]["codes"])
+            for origin in evaluation["metrics"]["origins"]
+        }
+        rankings.append({
+            "order": [row[0] for row in rows],
+            "scores": [row[2] for row in rows],
+            "cells": cells,
+            "complete": meta["complete"],
+        })
+    evaluation_seconds = time.perf_counter() - started
+    seconds = {"routes": route_seconds, "evaluation": evaluation_seconds}
+    return {"routes": routes, "rankings": rankings, "seconds": seconds}
+
+
+def _same_route(a, b):
+    return (
+        a["path"] == b["path"]
+        and a["availability"] == b["availability"]
+        and abs(a["time"] - b["time"]) <= _TIME_EPSILON
+    )
+
+
+def _compare(oracle, result, pairs, rosters):
+    """Human-readable mismatches between an oracle run and a variant run."""
+    mismatches = []
+    for (origin, dest, routing), a, b in zip(pairs, oracle["routes"], result["routes"]):
+        if not _same_route(a, b):
+            mismatches.append(
+                f"route {origin}->{dest} {routing}: {a['path']} {a['time']:.1f} vs {b['path']} {b['time']:.1f}"
+            )
+    for (roster, routing, options), a, b in zip(rosters, oracle["rankings"], result["rankings"]):
+        label = f"roster {','.join(sorted(set(roster)))} {routing} {options}"
+        if a["complete"] != b["complete"]:
+            mismatches.append(f"{label}: complete {a['complete']} vs {b['complete']}")
+        if a["order"] != b["order"]:
+            first = next(i for i, (x, y) in enumerate(zip(a["order"] + [None], b["order"] + [None])) if x != y)
+            mismatches.append(f"{label}: ranking differs at position {first + 1}")
+        elif any(abs(x - y) > _SCORE_EPSILON for x, y in zip(a["scores"], b["scores"])):
+            mismatches.append(f"{label}: scores differ")
+        for key in sorted(set(a["cells"]) | set(b["cells"])):
+            if key not in a["cells"] or key not in b["cells"] or not _same_route(a["cells"][key], b["cells"][key]):
+                mismatches.append(f"{label}: route {key} differs")
+                break
+    return mismatches
+
+
+def _report(name, oracle, result, mismatches):
+    speedup = {
+        part: oracle["seconds"][part] / result["seconds"][part] if result["seconds"][part] else float("inf")
+        for part in ("routes", "evaluation")
+    }
+    print(f"{name}: routes {result['seconds']['routes']:.2f}s ({speedup['routes']:.1f}x), "
+          f"evaluation {result['seconds']['evaluation']:.2f}s ({speedup['evaluation']:.1f}x), "
+          f"mismatches {len(mismatches)}")
+    for line in mismatches[:10]:
+        print(f"  {line}")
+
+
+def _signature(dataset):
+    return {"airports": len(dataset["airports"]), "edges": sum(len(v) for v in dataset["direct"].values())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pairs", type=int, default=400)
+    parser.add_argument("--rosters", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=3)
+    parser.add_argument("--variant", action="append", choices=sorted(VARIANTS), help="default: all")
+    parser.add_argument("--record", metavar="FILE", help="write the oracle's outputs to FILE")
+    parser.add_argument("--check", metavar="FILE", help="compare the current engine with a recorded FILE")
+    args = parser.parse_args()
+
+    dataset = backend._get_dataset()
+    if args.check:
+        with open(args.check, encoding="utf-8") as file:
+            frozen = json.load(file)
+        if frozen["dataset"] != _signature(dataset):
+            print(f"warning: recorded on a different dataset {frozen['dataset']}")
+        pairs = [tuple(pair) for pair in frozen["pairs"]]
+        rosters = [tuple(roster) for roster in frozen["rosters"]]
+        failed = False
+        for name in args.variant or ["current"]:
+            with _engine(VARIANTS.get(name, {})):
+                result = _run(pairs, rosters, dataset)
+            mismatches = _compare(frozen["oracle"], result, pairs, rosters)
+            _report(name, frozen["oracle"], result, mismatches)
+            failed |= bool(mismatches)
+        return 1 if failed else 0
+
+    pairs, rosters = _cases(dataset, args.pairs, args.rosters, args.seed)
+    print(f"pairs: {len(pairs)}, rosters: {len(rosters)}")
+    with _engine(REFERENCE):
+        oracle = _run(pairs, rosters, dataset)
+    print(f"oracle: routes {oracle['seconds']['routes']:.2f}s, evaluation {oracle['seconds']['evaluation']:.2f}s")
+    if args.record:
+        with open(args.record, "w", encoding="utf-8") as file:
+            json.dump({"dataset": _signature(dataset), "pairs": pairs, "rosters": rosters, "oracle": oracle}, file)
+        print(f"recorded to {args.record}")
+        return 0
+
+    failed = False
+    for name in args.variant or sorted(VARIANTS):
+        with _engine(VARIANTS[name]):
+            result = _run(pairs, rosters, dataset)
+        mismatches = _compare(oracle, result, pairs, rosters)
+        _report(name, oracle, result, mismatches)
+        failed |= bool(mismatches)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,26 @@ import sys
 import runpy
 
 
+def export_batch(directory, rosters_path):
+    from modules import backend, export
+
+    with open(rosters_path, encoding="utf-8") as file, export.ResultWriter(directory) as writer:
+        for line in file:
+            codes = line.replace(",", " ").split()
+            if not codes or codes[0].startswith("#"):
+                continue
+            _, meta = backend.compute_top10(codes)
+            if not meta.get("evaluation"):
+                sys.stderr.write(f"skipped {' '.join(codes)}: no results\n")
+                continue
+            written = writer.written
+            writer.add(meta, roster_id=" ".join(codes))
+            # Written rosters are not needed again; keep memory flat over long batches
+            if writer.written != written:
+                backend.clear_search_caches()
+    print(f"exported {writer.rosters} rosters to {directory}")
+
+
 def main():
     here = os.path.dirname(os.path.abspath(__file__))
     ui_path = os.path.join(here, "modules", "UI-Sam.py")
@@ -14,6 +34,34 @@ def main():
     if here not in sys.path:
         sys.path.insert(0, here)
 
+    # `--export DIR ROSTERS` evaluates every roster in ROSTERS (one per line) into DIR without the UI
+    if "--export" in sys.argv:
+        position = sys.argv.index("--export")
+        if position + 2 >= len(sys.argv):
+            sys.stderr.write("usage: python main.py --export DIR ROSTERS\n")
+            sys.exit(2)
+        export_batch(sys.argv[position + 1], sys.argv[position + 2])
+        return
+
+    # `--build-hub-matrix [N]` precomputes itineraries to the N best hubs into assets/hub_matrix
+    if "--build-hub-matrix" in sys.argv:
+        position = sys.argv.index("--build-hub-matrix")
+        from modules import backend
+
+        count = backend._HUB_MATRIX_HUBS
+        if position + 1 < len(sys.argv) and sys.argv[position + 1].isdigit():
+            count = int(sys.argv[position + 1])
+        print(f"hub matrix written to {backend.build_hub_matrix(count)}")
+        return
+
+    # `--trace DIR` writes a Chrome trace JSON per submission into DIR
+    if "--trace" in sys.argv:
+        position = sys.argv.index("--trace")
+        trace_dir = sys.argv[position + 1] if position + 1 < len(sys.argv) else os.path.join(here, "traces")
+        from modules import profiling
+
+        profiling.Enable(trace_dir)
+
     # Execute the UI script as the main module
     runpy.run_path(ui_path, run_name="__main__")
 
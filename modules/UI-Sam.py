@@ -2,10 +2,12 @@
 from tkinter import ttk, messagebox
 import tkintermapview as tkm
 import csv
+import math
 import os
 import threading
-from PIL import Image
-from modules import backend
+import time
+from PIL import Image, ImageDraw, ImageTk
+from modules import backend, carriers, profiling, schedule, scoring
 
 # ---------- APP CONFIG ----------
 ctk.set_appearance_mode("dark")
@@ -56,7 +58,7 @@ left_frame.grid(row=1, column=0, rowspan=2, sticky="nsew", padx=(20, 10), pady=1
 left_frame.grid_rowconfigure(10, weight=1)
 left_frame.grid_columnconfigure(0, weight=1)
 
-input_label = ctk.CTkLabel(left_frame, text="Enter 2-25 IATA Codes (e.g. LHR, JFK, DXB):",
+input_label = ctk.CTkLabel(left_frame, text="Enter up to 25 IATA Codes (e.g. LHR, JFK*3, DXB):",
                            font=ctk.CTkFont(size=14))
 input_label.pack(padx=10, pady=(20, 5))
 
@@ -71,6 +73,9 @@ hub_entry = ctk.CTkEntry(left_frame, placeholder_text="e.g. AMS")
 hub_entry.pack(padx=10, pady=(0, 10))
 hub_entry.insert(0, "AMS")
 
+arrive_entry = ctk.CTkEntry(left_frame, width=220, placeholder_text="Arrive by (optional, e.g. Tue 09:00 UTC)")
+arrive_entry.pack(padx=10, pady=(0, 10))
+
 # Hide hub input (removed per request)
 hub_label.pack_forget()
 hub_entry.pack_forget()
@@ -82,19 +87,38 @@ IATA_MEETING_MARKER = None
 IATA_PATHS = []           # path lines from starts -> meeting
 IATA_LAYOVER_MARKERS = [] # layover markers for connecting itineraries
 CURRENT_RESULT_META = {}  # cached metadata from backend.compute_top10
+CURRENT_CODES = []        # origins of the last submission
+SESSION = None            # backend.EvaluationSession reused while the roster is edited
+SUMMARY_FUTURES = {}      # hub -> Future of its AI summary for the current results
+SUMMARY_TARGET = None     # hub whose summary the summary box is waiting for
+SURFACE_MARKERS = []      # graded markers of the score surface
+SURFACE_ICONS = {}        # colour -> dot image shared by surface markers
+SURFACE_REQUEST = None    # token of the surface being computed; older results are dropped
 
 ROUTE_COLORS = {
     "direct": "#4caf50",
     "one_stop": "#ffb300",
     "two_stop": "#ab47bc",
+    "three_stop": "#7e57c2",
+    "four_stop": "#5c6bc0",
+    "ground": "#66bb6a",
     "fallback": "#ef5350",
     "same": "#64b5f6",
 }
 DEFAULT_ROUTE_COLOR = "#9e9e9e"
+# Score surface: worst to best, one marker per grid cell for the best cells
+SURFACE_COLORS = ("#ef5350", "#ff7043", "#ffb300", "#d4e157", "#4caf50")
+SURFACE_MAX_MARKERS = 400
 
 submit_button = None
 ai_summary_box = None
 progress_bar = None
+ranking_var = None
+carrier_var = None
+nearby_var = None
+stops_var = None
+venues_var = None
+surface_var = None
 
 
 def _set_ai_summary_text(text):
@@ -106,6 +130,31 @@ def _set_ai_summary_text(text):
     ai_summary_box.configure(state="disabled")
 
 
+def _session_for(alliance, max_stops):
+    # Roster edits with the same routing reuse the session's metric matrix
+    global SESSION
+    if SESSION is None or SESSION.alliance != alliance or SESSION.max_stops != max_stops:
+        SESSION = backend.EvaluationSession(alliance=alliance, max_stops=max_stops)
+    return SESSION
+
+
+def _trace_span(trace, name, begin, **args):
+    # Record a span that started at `begin` (time.perf_counter) when profiling is on
+    if trace is not None:
+        trace.add(name, begin, time.perf_counter(), **args)
+
+
+def _finish_trace(trace):
+    if trace is not None:
+        path = trace.finish()
+        if path:
+            print(f"[profile] trace written to {path}")
+
+
+def _format_origins(origins):
+    return ", ".join(code if weight == 1 else f"{code} x{weight:g}" for code, weight in origins)
+
+
 def _empty_meta():
     return {"by_candidate": {}, "requested_origins": [], "ordered_candidates": []}
 
@@ -190,11 +239,34 @@ def on_submit():
 
     messagebox.showinfo("Submitted", f"Processing for: {', '.join(codes)} → Hub: {hub_code}")
 
+def _parse_origin_tokens(text):
+    """Parse "LHR JFK*3 DXB" into (code, weight) pairs; `*N` gives N attendees or a priority weight.
+    Returns None if a weight cannot be parsed or is not a positive finite number.
+    """
+    pairs = []
+    for token in text.replace(",", " ").split():
+        code, _, weight = token.strip().partition("*")
+        try:
+            value = float(weight) if weight else 1.0
+        except ValueError:
+            return None
+        if not (math.isfinite(value) and value > 0):
+            return None
+        pairs.append((code.strip(), value))
+    return pairs
+
+
 def on_submit_no_hub():
     text = location_box.get("1.0", "end").strip().upper()
-    codes = [c.strip() for c in text.replace(",", " ").split() if c.strip()]
-    if len(codes) < 2 or len(codes) > 25:
-        messagebox.showerror("Error", "Please enter between 2 and 25 IATA codes.")
+    pairs = _parse_origin_tokens(text)
+    if pairs is None:
+        messagebox.showerror("Error", "Attendee counts must be positive numbers, e.g. JFK*3.")
+        return
+    origins = backend.NormaliseOrigins(pairs)
+    codes = [code for code, _ in origins]
+    attendees = sum(weight for _, weight in origins)
+    if len(codes) > backend.numOrigins or (len(codes) < 2 and attendees < 2):
+        messagebox.showerror("Error", f"Please enter at least 2 attendees from up to {backend.numOrigins} airports.")
         return
 
     if submit_button is not None:
@@ -215,26 +287,54 @@ def on_submit_no_hub():
             pass
 
     progress_lines = [
-        f"Received attendees: {', '.join(codes)}",
+        f"Received attendees: {_format_origins(origins)}",
         "Computing meeting recommendations...",
     ]
     _set_ai_summary_text("\n".join(progress_lines))
 
+    arrive_by = arrive_entry.get().strip() or None
+    if arrive_by is not None:
+        try:
+            schedule.ParseWeekTime(arrive_by)
+        except ValueError:
+            messagebox.showerror("Error", "Arrival deadline must look like 'Tue 09:00'.")
+            return
+        if not backend.has_timetable():
+            messagebox.showwarning(
+                "No timetable", "assets/schedules.dat is missing, so the arrival deadline is ignored."
+            )
+            arrive_by = None
+
+    weights = scoring.PRESETS.get(ranking_var.get()) if ranking_var is not None else None
+    alliance = carrier_var.get() if carrier_var is not None else None
+    if alliance not in carriers.ALLIANCES:
+        alliance = None
+    nearby_airports = bool(nearby_var.get()) if nearby_var is not None else False
+    max_stops = STOP_CHOICES.get(stops_var.get()) if stops_var is not None else None
+    trace = profiling.StartTrace("submission", origins=_format_origins(origins))
+
     def _background():
         error = None
         try:
-            rows, meta = backend.compute_top10(codes)
+            with profiling.Activate(trace), profiling.Span("compute"):
+                if arrive_by is None and not nearby_airports:
+                    session = _session_for(alliance, max_stops)
+                    session.weights = weights
+                    rows, meta = session.update(origins)
+                else:
+                    rows, meta = backend.compute_top10(origins, weights, arrive_by=arrive_by, alliance=alliance,
+                                                       nearby_airports=nearby_airports, max_stops=max_stops)
             if not isinstance(meta, dict):
                 meta = _empty_meta()
         except Exception as exc:
             rows, meta = [], _empty_meta()
             error = exc
-        app.after(0, lambda: _apply_submission_results(codes, rows, meta, error))
+        app.after(0, lambda: _apply_submission_results(codes, rows, meta, error, trace))
 
     threading.Thread(target=_background, daemon=True).start()
 
 
-def _apply_submission_results(codes, rows, meta, error=None):
+def _apply_submission_results(codes, rows, meta, error=None, trace=None):
     if submit_button is not None:
         submit_button.configure(state="normal")
 
@@ -251,8 +351,9 @@ def _apply_submission_results(codes, rows, meta, error=None):
     if not isinstance(meta, dict):
         meta = _empty_meta()
 
-    global CURRENT_RESULT_META
+    global CURRENT_RESULT_META, CURRENT_CODES
     CURRENT_RESULT_META = meta
+    CURRENT_CODES = list(codes)
 
     if error:
         print(f"[submit] compute_top10 failed: {error}")
@@ -265,12 +366,19 @@ def _apply_submission_results(codes, rows, meta, error=None):
             pass
 
     sanitized_rows = rows or []
+    origins = meta.get("origins") or [(code, 1) for code in codes]
+    attendees_text = _format_origins(origins)
 
     # Always clear table then insert latest results (if any)
+    table_started = time.perf_counter()
+    _set_table_mode(venues=False)
+    if venues_var is not None:
+        venues_var.set(VENUE_CHOICES[0])
     for item in table.get_children():
         table.delete(item)
     for r in sanitized_rows:
-        # r is [iata, airport_name, score, mean_time, total_co2, total_distance, connectivity_summary]
+        # r is [iata, airport_name, score, mean_time, total_co2, total_distance, connectivity_summary, pareto_rank,
+        #       max_time, p90_time, time_gini]
         try:
             values = (
                 str(r[0]),
@@ -280,12 +388,18 @@ def _apply_submission_results(codes, rows, meta, error=None):
                 f"{float(r[4]):.2f}",
                 f"{float(r[5]):.2f}",
                 str(r[6]),
+                str(r[7]),
+                f"{float(r[8]):.2f}",
+                f"{float(r[9]):.2f}",
+                f"{float(r[10]):.3f}",
             )
         except Exception:
             values = tuple(str(x) for x in r)
         table.insert("", "end", values=values)
+    _trace_span(trace, "table_render", table_started, rows=len(sanitized_rows))
 
     # 2) Plot starting codes on the map using IATA database
+    map_started = time.perf_counter()
     db = load_iata_db()
     # clear previous markers
     for m in list(IATA_MARKERS):
@@ -456,13 +570,20 @@ def _apply_submission_results(codes, rows, meta, error=None):
             map_widget.set_zoom(4)
         else:
             map_widget.set_zoom(3)
+    _trace_span(trace, "map_render", map_started, markers=len(IATA_MARKERS), paths=len(IATA_PATHS))
+    _request_surface(origins)
+    if trace is not None:
+        # Flush pending redraws so the mark reflects what the user actually sees
+        app.update_idletasks()
+        trace.mark("first_paint")
 
     # Pull the top row directly from the rendered table so the summary reflects the visible data
     table_items = table.get_children()
     top_row = table.item(table_items[0], "values") if table_items else None
 
     if not top_row or len(top_row) < 7:
-        _set_ai_summary_text(f"Received attendees: {', '.join(codes)}\nNo results computed.")
+        _set_ai_summary_text(f"Received attendees: {attendees_text}\nNo results computed.")
+        _finish_trace(trace)
         return
 
     safe = list(top_row)
@@ -485,13 +606,21 @@ def _apply_submission_results(codes, rows, meta, error=None):
             f"Routes: direct {stats.get('direct', 0)}, "
             f"1-stop {stats.get('one_stop', 0)}, "
             f"2-stop {stats.get('two_stop', 0)}, "
+            f"3+ stop {stats.get('three_stop', 0) + stats.get('four_stop', 0)}, "
+            f"ground {stats.get('ground', 0)}, "
             f"fallback {stats.get('fallback', 0)}, "
             f"local {stats.get('same', 0)}"
         )
 
-    intro_lines = [f"Received attendees: {', '.join(codes)}", "Generating AI summary..."]
+    departures = candidate_detail.get("departures") if candidate_detail else None
+    moved = [f"{origin}→{code}" for origin, code in (departures or {}).items() if code != origin]
+    departures_line = f"Departing from: {', '.join(moved)}" if moved else ""
+
+    intro_lines = [f"Received attendees: {attendees_text}", "Generating AI summary..."]
     if stats_summary_line:
         intro_lines.append(stats_summary_line)
+    if departures_line:
+        intro_lines.append(departures_line)
     _set_ai_summary_text("\n".join(intro_lines))
 
     fallback_lines = [
@@ -501,33 +630,292 @@ def _apply_submission_results(codes, rows, meta, error=None):
     ]
     if stats_summary_line:
         fallback_lines.append(stats_summary_line)
+    if departures_line:
+        fallback_lines.append(departures_line)
     fallback = "\n".join(fallback_lines)
 
-    stats_payload = dict(stats) if isinstance(stats, dict) and stats else None
+    # Summaries for every row are requested at once; the top row's is shown when it lands and
+    # the others are ready when a row is selected
+    global SUMMARY_FUTURES, SUMMARY_TARGET
+    SUMMARY_TARGET = top_row[0]
+    SUMMARY_FUTURES = {}
+    summary_lines = {}
+    by_candidate = meta.get("by_candidate") or {}
+    requests = []
+    for item in table_items:
+        values = table.item(item, "values")
+        hub = values[0]
+        detail = by_candidate.get(hub) or {}
+        row_stats = detail.get("stats")
+        moved_from = [f"{origin}→{code}" for origin, code in (detail.get("departures") or {}).items() if code != origin]
+        summary_lines[hub] = f"Departing from: {', '.join(moved_from)}" if moved_from else ""
+        if backend.get_cached_summary(meta, hub):
+            continue
+        try:
+            requests.append(
+                {
+                    "CO2": float(values[4]),
+                    "time": float(values[3]),
+                    "distance": float(values[5]),
+                    "numPeople": int(round(sum(weight for _, weight in origins))),
+                    "locations": origins,
+                    "hub": hub,
+                    "connectivity": str(values[6]),
+                    "stats": dict(row_stats) if isinstance(row_stats, dict) and row_stats else None,
+                }
+            )
+        except (IndexError, ValueError):
+            continue
+
+    cached_text = backend.get_cached_summary(meta, top_row[0])
+    if cached_text:
+        _set_ai_summary_text(f"{cached_text}\n{departures_line}" if departures_line else cached_text)
+        _finish_trace(trace)
+    if not requests:
+        _finish_trace(trace)
+        return
+
+    ai_started = time.perf_counter()
+    try:
+        from modules import AI
+
+        futures = SUMMARY_FUTURES = AI.get_service().summarize_many(requests)
+    except Exception as exc:
+        print(f"[submit] AI summaries failed: {exc}")
+        if not cached_text:
+            _set_ai_summary_text(fallback)
+        _finish_trace(trace)
+        return
+    # The trace ends with the top row's summary, or once every summary has settled
+    # if the top row's was never requested
+    pending = [len(futures)]
+    if not futures:
+        _finish_trace(trace)
+
+    def _show_summary(hub, text):
+        pending[0] -= 1
+        if hub == top_row[0]:
+            _trace_span(trace, "ai", ai_started, hub=hub, rows=len(requests))
+        if hub == top_row[0] or pending[0] <= 0:
+            _finish_trace(trace)
+        # Ignore summaries from an earlier submission or for a row that is no longer selected
+        if SUMMARY_FUTURES is not futures or hub != SUMMARY_TARGET:
+            return
+        if not text and hub == top_row[0]:
+            _set_ai_summary_text(fallback)
+            return
+        text = text or f"AI summary unavailable for {hub}."
+        line = summary_lines.get(hub)
+        _set_ai_summary_text(f"{text}\n{line}" if line else text)
 
-    def _worker():
+    def _on_done(hub, future):
         try:
-            from modules.AI import reason
-
-            co2_val = float(top_row[4])
-            time_val = float(top_row[3])
-            dist_val = float(top_row[5])
-            text = reason(
-                CO2=co2_val,
-                time=time_val,
-                distance=dist_val,
-                numPeople=len(codes),
-                locations=codes,
-                hub=top_row[0],
-                connectivity=conn_s,
-                stats=stats_payload,
+            text = future.result()
+        except Exception:
+            text = None
+        if text:
+            backend.store_summary(meta, hub, text)
+        app.after(0, lambda: _show_summary(hub, text))
+
+    for hub, future in futures.items():
+        future.add_done_callback(lambda done, hub=hub: _on_done(hub, done))
+
+
+def on_table_select(event=None):
+    # Show the selected candidate's summary, which is usually already fetched
+    global SUMMARY_TARGET
+    selection = table.selection()
+    if not selection:
+        return
+    hub = table.item(selection[0], "values")[0]
+    cached_text = backend.get_cached_summary(CURRENT_RESULT_META, hub)
+    if not cached_text and hub not in SUMMARY_FUTURES:
+        return
+    SUMMARY_TARGET = hub
+    if cached_text:
+        _set_ai_summary_text(cached_text)
+    elif SUMMARY_FUTURES[hub].done():
+        _set_ai_summary_text(SUMMARY_FUTURES[hub].result() or f"AI summary unavailable for {hub}.")
+    else:
+        _set_ai_summary_text(f"Generating AI summary for {hub}...")
+
+
+def _surface_icon(color):
+    icon = SURFACE_ICONS.get(color)
+    if icon is None:
+        image = Image.new("RGBA", (12, 12), (0, 0, 0, 0))
+        ImageDraw.Draw(image).ellipse((1, 1, 10, 10), fill=color, outline="#1e1e1e")
+        icon = SURFACE_ICONS[color] = ImageTk.PhotoImage(image)
+    return icon
+
+
+def _clear_surface():
+    for marker in SURFACE_MARKERS:
+        try:
+            marker.delete()
+        except Exception:
+            pass
+    SURFACE_MARKERS.clear()
+    map_label.configure(text="Locations")
+
+
+def _on_surface_click(marker):
+    code, score, refined = marker.data
+    name = (load_iata_db().get(code) or (None, None, ""))[2]
+    kind = "route-aware" if refined else "estimated"
+    _set_ai_summary_text(f"{code} - {name}\nSurface score {score:.4f} ({kind})")
+
+
+def _draw_surface(result):
+    _clear_surface()
+    cells = result["cells"][:SURFACE_MAX_MARKERS]
+    if not cells:
+        return
+    high, low = cells[0][4], cells[-1][4]
+    for _, _, _, _, score, index in cells:
+        level = 0 if high <= low else (score - low) / (high - low)
+        color = SURFACE_COLORS[min(int(level * len(SURFACE_COLORS)), len(SURFACE_COLORS) - 1)]
+        code = result["codes"][index]
+        try:
+            marker = map_widget.set_marker(
+                float(result["lat"][index]), float(result["lon"][index]), text="", icon=_surface_icon(color),
+                data=(code, score, bool(result["refined"][index])), command=_on_surface_click,
             )
-            final_text = str(text).strip() if text else ""
-            app.after(0, lambda: _set_ai_summary_text(final_text if final_text else fallback))
         except Exception:
-            app.after(0, lambda: _set_ai_summary_text(fallback))
+            continue
+        SURFACE_MARKERS.append(marker)
+    map_label.configure(text=f"Locations - score surface: {len(result['codes'])} airports, "
+                             f"{int(result['refined'].sum())} route-aware, best {result['best']}")
 
-    threading.Thread(target=_worker, daemon=True).start()
+
+def _request_surface(origins):
+    # Score every airport in the background; only the latest request is drawn
+    global SURFACE_REQUEST
+    SURFACE_REQUEST = token = object()
+    if surface_var is None or not surface_var.get() or not origins:
+        _clear_surface()
+        return
+    weights = scoring.PRESETS.get(ranking_var.get()) if ranking_var is not None else None
+    alliance = carrier_var.get() if carrier_var is not None else None
+    if alliance not in carriers.ALLIANCES:
+        alliance = None
+    max_stops = STOP_CHOICES.get(stops_var.get()) if stops_var is not None else None
+
+    def _show(result):
+        if SURFACE_REQUEST is token and surface_var.get():
+            _draw_surface(result)
+
+    def _background():
+        try:
+            result = backend.score_surface(origins, weights, alliance=alliance, max_stops=max_stops)
+        except Exception as exc:
+            print(f"[surface] score_surface failed: {exc}")
+            result = None
+        if result is not None:
+            app.after(0, lambda: _show(result))
+
+    threading.Thread(target=_background, daemon=True).start()
+
+
+def on_surface_toggle():
+    if not CURRENT_CODES:
+        return
+    _request_surface(CURRENT_RESULT_META.get("origins") or [(code, 1) for code in CURRENT_CODES])
+
+
+def on_ranking_change(choice):
+    # Re-rank the cached evaluation; no routes are searched again
+    if not CURRENT_RESULT_META.get("evaluation"):
+        return
+    rows, meta = backend.rescore_last(scoring.PRESETS.get(choice))
+    _apply_submission_results(CURRENT_CODES, rows, meta)
+
+
+VENUE_CHOICES = ("1 venue", "2 venues", "3 venues")
+# Column headings that change meaning when the table lists venues instead of candidates
+VENUE_HEADINGS = {"Score": "Attendees", "Connectivity": "Assigned Origins", "Pareto": "Venue"}
+
+
+def _set_table_mode(venues):
+    for col in VENUE_HEADINGS:
+        table.heading(col, text=VENUE_HEADINGS[col] if venues else col)
+
+
+def _show_venue_results(rows, result):
+    # rows are [iata, airport_name, attendees, mean_time, total_co2, total_distance, assigned_origins, venue,
+    #           max_time, p90_time, time_gini]; the last row holds the totals
+    _set_table_mode(venues=True)
+    for item in table.get_children():
+        table.delete(item)
+    for r in rows:
+        try:
+            values = (
+                str(r[0]),
+                str(r[1]),
+                str(r[2]),
+                f"{float(r[3]):.2f}",
+                f"{float(r[4]):.2f}",
+                f"{float(r[5]):.2f}",
+                str(r[6]),
+                str(r[7]),
+                f"{float(r[8]):.2f}",
+                f"{float(r[9]):.2f}",
+                f"{float(r[10]):.3f}",
+            )
+        except Exception:
+            values = tuple(str(x) for x in r)
+        table.insert("", "end", values=values)
+
+    lines = [f"{len(result['venues'])} venues ({result['solver']} solver, minimising total {result['objective']}):"]
+    for venue in result["venues"]:
+        lines.append(f"{venue['code']}: {', '.join(venue['origins']) or 'no attendees'}")
+    _set_ai_summary_text("\n".join(lines))
+
+
+def on_venues_change(choice):
+    # Split attendees across k venues using the cached matrix; 1 venue restores the ranking
+    if not CURRENT_RESULT_META.get("evaluation"):
+        return
+    count = int(choice.split()[0])
+    if count <= 1:
+        on_ranking_change(ranking_var.get())
+        return
+    rows, result = backend.select_venues_last(count)
+    if result is not None:
+        _show_venue_results(rows, result)
+
+
+ranking_label = ctk.CTkLabel(left_frame, text="Ranking:", font=ctk.CTkFont(size=14))
+ranking_label.pack(padx=10, pady=(0, 5))
+
+ranking_var = ctk.StringVar(value="Balanced")
+ranking_menu = ctk.CTkOptionMenu(left_frame, values=list(scoring.PRESETS), variable=ranking_var,
+                                 command=on_ranking_change, width=160)
+ranking_menu.pack(padx=10, pady=(0, 10))
+
+carrier_var = ctk.StringVar(value="Any airline")
+carrier_menu = ctk.CTkOptionMenu(left_frame, values=["Any airline"] + list(carriers.ALLIANCES), variable=carrier_var,
+                                 width=160)
+carrier_menu.pack(padx=10, pady=(0, 10))
+
+venues_var = ctk.StringVar(value=VENUE_CHOICES[0])
+venues_menu = ctk.CTkOptionMenu(left_frame, values=list(VENUE_CHOICES), variable=venues_var,
+                                command=on_venues_change, width=160)
+venues_menu.pack(padx=10, pady=(0, 10))
+
+STOP_CHOICES = {"Up to 2 stops": None, "Up to 3 stops": 3, "Up to 4 stops": 4}
+stops_var = ctk.StringVar(value="Up to 2 stops")
+stops_menu = ctk.CTkOptionMenu(left_frame, values=list(STOP_CHOICES), variable=stops_var, width=160)
+stops_menu.pack(padx=10, pady=(0, 10))
+
+nearby_var = ctk.BooleanVar(value=False)
+nearby_check = ctk.CTkCheckBox(left_frame, text="Use nearby airports", variable=nearby_var)
+nearby_check.pack(padx=10, pady=(0, 10))
+
+surface_var = ctk.BooleanVar(value=False)
+surface_check = ctk.CTkCheckBox(left_frame, text="Show score surface", variable=surface_var,
+                                command=on_surface_toggle)
+surface_check.pack(padx=10, pady=(0, 10))
 
 submit_button = ctk.CTkButton(left_frame, text="Submit", command=on_submit_no_hub, width=160, height=36)
 submit_button.pack(pady=(5, 15))
@@ -564,12 +952,29 @@ style.configure("Treeview.Heading",
                 foreground="white")
 style.map("Treeview", background=[("selected", "#1f538d")])
 
-columns = ("IATA", "Airport", "Score", "Mean Time (min)", "Total CO2 (kg)", "Total Distance (km)", "Connectivity")
-column_widths = (80, 220, 90, 150, 150, 170, 220)
-column_anchors = ("center", "w", "center", "center", "center", "center", "w")
+columns = ("IATA", "Airport", "Score", "Mean Time (min)", "Total CO2 (kg)", "Total Distance (km)", "Connectivity",
+           "Pareto", "Max Time (min)", "P90 Time (min)", "Time Gini")
+column_widths = (80, 220, 90, 150, 150, 170, 220, 70, 140, 140, 100)
+column_anchors = ("center", "w", "center", "center", "center", "center", "w", "center", "center", "center", "center")
 table = ttk.Treeview(table_frame, columns=columns, show="headings")
+
+
+def _sort_table(col, descending=False):
+    def _key(item):
+        value = table.set(item, col)
+        try:
+            return (0, float(value))
+        except ValueError:
+            return (1, value)
+
+    items = sorted(table.get_children(), key=_key, reverse=descending)
+    for index, item in enumerate(items):
+        table.move(item, "", index)
+    table.heading(col, command=lambda: _sort_table(col, not descending))
+
+
 for col, width, anchor in zip(columns, column_widths, column_anchors):
-    table.heading(col, text=col)
+    table.heading(col, text=col, command=lambda c=col: _sort_table(c))
     table.column(col, anchor=anchor, width=width, stretch=(anchor == "w"))
 
 scroll_y = ttk.Scrollbar(table_frame, orient="vertical", command=table.yview)
@@ -578,6 +983,7 @@ table.configure(yscroll=scroll_y.set, xscroll=scroll_x.set)
 scroll_y.pack(side="right", fill="y")
 scroll_x.pack(side="bottom", fill="x")
 table.pack(fill="both", expand=True, padx=10, pady=10)
+table.bind("<<TreeviewSelect>>", on_table_select)
 
 # Example data
 sample_data = [
@@ -1,19 +1,60 @@
+import hashlib
 import heapq
+import math
 import os
-from collections import deque
-
-_AIRPORT_CACHE = None
-_ROUTE_DIRECT_CACHE = None
-_ROUTE_INBOUND_CACHE = None
+import threading
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from modules import (
+    carriers, emissions, fairness, ground, hubmatrix, hubs, metros, profiling, schedule, scoring, surface, trees,
+    venues,
+)
+from modules.records import RouteDetail, RouteSegment, SearchLabel
+
+_DATASET = None           # active snapshot: version, airports, routes and timetable
+_DATASET_LOCK = threading.Lock()
+_RELOAD_THREAD = None
+_LAST_RELOAD_CHECK = 0.0
+_FAILED_SIGNATURE = None
+_GRAPH_VERSIONS = {}      # id(route map) -> (dataset version, route map)
 _LAST_RESULTS_META = {"by_candidate": {}, "requested_origins": [], "ordered_candidates": []}
 _ROUTE_DETAIL_CACHE = {}
 _REACHABLE_CACHE = {}
 _COLLECT_REACHABLE_CACHE = {}
+_EDGE_ARRAY_CACHE = {}
+_ORIGIN_TREE_CACHE = OrderedDict()  # least recently used first
+_RESULT_CACHE = OrderedDict()       # query key -> {"created", "rows", "meta", "summaries"}
+_SEARCH_STATS = {"searches": 0, "pushes": 0, "pops": 0, "trees": 0, "tree_hits": 0}
 
-numOrigins = 25
+numOrigins = 25  # maximum number of unique origin airports
 _LAYOVER_MINUTES = 75.0
 _FALLBACK_PENALTY_MINUTES = 120.0
-_MAX_ALLOWED_STOPS = 2
+_MAX_ALLOWED_STOPS = 2   # default stop limit; requests may pass max_stops up to _STOP_LIMIT
+_STOP_LIMIT = 4
+_USE_ASTAR = True
+_CANDIDATE_NEAREST = 80
+_CANDIDATE_HUBS = 40
+_HUB_DISTANCE_SCALE_KM = 4000.0
+_RELOAD_CHECK_SECONDS = 5.0
+_USE_ORIGIN_TREES = True
+_ORIGIN_TREE_BUDGET_BYTES = 64 * 1024 * 1024
+_RESULT_CACHE_SIZE = 64
+_RESULT_CACHE_TTL_SECONDS = 15 * 60.0
+_MATRIX_KEYS = ("time", "distance", "co2", "stops", "availability", "airlines")
+_SESSION_POOL_DRIFT_KM = 750.0      # minimum centroid drift that rebuilds a session's pool
+_SESSION_POOL_DRIFT_SPREAD = 0.5    # ... raised to this fraction of the roster's spread
+_GROUND_RADIUS_KM = 200.0  # ground links between airports this close; 0 disables them
+_GROUND_NEIGHBOURS = 6
+_USE_HUB_MATRIX = True
+_HUB_MATRIX_HUBS = 300
+_SURFACE_REFINE = 120       # best-estimated airports searched route-aware by score_surface
+_SURFACE_REFINE_LIMIT = 1200
+_SURFACE_CELL_DEGREES = 2.0
+_SWEEP_KEYS = ("name", "weights", "fallback_penalty", "max_stops", "layover_minutes", "carriers_allowed", "alliance",
+               "same_carrier")
 
 
 def LoadAirportData(path):
@@ -39,6 +80,7 @@ def LoadAirportData(path):
                 "lat": lat,
                 "lon": lon,
                 "name": parts[1],
+                "city": parts[2],
                 "country": parts[3],
             }
     return airports
@@ -60,14 +102,74 @@ def _routes_path():
     return os.path.join(root, "assets", "routes.dat")
 
 
-def _get_airports():
-    global _AIRPORT_CACHE
-    if _AIRPORT_CACHE is None:
-        _AIRPORT_CACHE = LoadAirportData(_airports_path())
-    return _AIRPORT_CACHE
+def _schedules_path():
+    try:
+        root = os.path.dirname(os.path.dirname(__file__))
+    except Exception:
+        root = os.getcwd()
+    return os.path.join(root, "assets", "schedules.dat")
 
 
-def LoadRouteData(path):
+def _connections_path():
+    try:
+        root = os.path.dirname(os.path.dirname(__file__))
+    except Exception:
+        root = os.getcwd()
+    return os.path.join(root, "assets", "connections.dat")
+
+
+def _hub_matrix_path():
+    try:
+        root = os.path.dirname(os.path.dirname(__file__))
+    except Exception:
+        root = os.getcwd()
+    return os.path.join(root, "assets", "hub_matrix")
+
+
+def _data_digest():
+    # Content hash of the route inputs; file times change on every copy
+    digest = hashlib.sha1()
+    for path in (_airports_path(), _routes_path()):
+        with open(path, "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+def _model_digest():
+    # Hash of the time and CO2 model constants that per-edge times and emissions
+    # are computed from; two CalculateTime samples pin its overhead and speed
+    model = (
+        CalculateTime(100.0),
+        CalculateTime(1000.0),
+        ground.DETOUR_FACTOR,
+        ground.SPEED_KMH,
+        ground.OVERHEAD_MINUTES,
+        sorted(emissions.CATEGORY_FACTORS.items()),
+        emissions.DISTANCE_BANDS,
+        sorted(emissions.EQUIPMENT_CATEGORIES.items()),
+        emissions.GROUND_FACTOR,
+    )
+    return hashlib.sha1(repr(model).encode("utf-8")).hexdigest()
+
+
+def _hub_matrix_settings(digest):
+    # Everything the stored itineraries depend on; a mismatch means the matrix is stale
+    return {
+        "data": digest,
+        "model": _model_digest(),
+        "max_stops": _MAX_ALLOWED_STOPS,
+        "layover_minutes": _LAYOVER_MINUTES,
+        "ground_radius_km": _GROUND_RADIUS_KM,
+        "ground_neighbours": _GROUND_NEIGHBOURS,
+    }
+
+
+def LoadRouteData(path, airports=None):
+    """Load direct (src -> dest) and inbound (dest -> src) route maps.
+
+    When `airports` is given, every edge is annotated once with its distance,
+    flight time and per-passenger CO2 (see _annotate_edges).
+    """
     import csv
 
     direct = {}
@@ -91,35 +193,215 @@ def LoadRouteData(path):
                 stops = 0
             if stops != 0:
                 continue
+            equipment = (parts[8] or "").split() if len(parts) > 8 else []
             src_map = direct.setdefault(src, {})
-            entry = src_map.setdefault(dest, {"airlines": set()})
+            entry = src_map.setdefault(dest, {"airlines": set(), "equipment": set()})
             if airline:
                 entry["airlines"].add(airline)
+            entry["equipment"].update(equipment)
             dest_map = inbound.setdefault(dest, {})
-            entry_inbound = dest_map.setdefault(src, {"airlines": set()})
+            entry_inbound = dest_map.setdefault(src, {"airlines": set(), "equipment": set()})
             if airline:
                 entry_inbound["airlines"].add(airline)
+            entry_inbound["equipment"].update(equipment)
     for src_code, destinations in direct.items():
         for dest_code, info in destinations.items():
             info["airlines"] = frozenset(info["airlines"])
+            info["equipment"] = frozenset(info["equipment"])
     for dest_code, sources in inbound.items():
         for src_code, info in sources.items():
             info["airlines"] = frozenset(info["airlines"])
+            info["equipment"] = frozenset(info["equipment"])
+    if airports is not None:
+        _annotate_edges(direct, airports, reverse=False)
+        _annotate_edges(inbound, airports, reverse=True)
     return direct, inbound
 
 
-def _get_routes():
-    global _ROUTE_DIRECT_CACHE, _ROUTE_INBOUND_CACHE
-    if _ROUTE_DIRECT_CACHE is None or _ROUTE_INBOUND_CACHE is None:
+def _annotate_edges(routes, airports, reverse):
+    # Precompute per-edge distance, time and CO2 so route searches only add them up.
+    # Edges touching an airport without coordinates get None and are skipped by searches.
+    for code, neighbours in routes.items():
+        code_data = airports.get(code)
+        for other, info in neighbours.items():
+            other_data = airports.get(other)
+            if not code_data or not other_data:
+                info["distance"] = info["time"] = info["co2"] = None
+                continue
+            if reverse:
+                distance = HaversineDistance(other_data["lat"], other_data["lon"], code_data["lat"], code_data["lon"])
+            else:
+                distance = HaversineDistance(code_data["lat"], code_data["lon"], other_data["lat"], other_data["lon"])
+            info["distance"] = distance
+            info["time"] = CalculateTime(distance)
+            info["co2"] = CalculateCO2Emissions(distance, info.get("equipment"))
+
+
+def _add_ground_edges(direct, inbound, airports):
+    # Ground legs go to airports with air service only, so they never become candidates
+    # on their own; pairs that already have a direct flight keep just the flight
+    served = set(direct)
+    for source, target, distance in ground.GroundEdges(airports, served, _GROUND_RADIUS_KM, _GROUND_NEIGHBOURS):
+        if target in direct.get(source, {}):
+            continue
+        info = dict(ground.GroundLeg(distance), airlines=frozenset(), equipment=frozenset(), mask=0, mode="ground")
+        direct.setdefault(source, {})[target] = info
+        inbound.setdefault(target, {})[source] = dict(info)
+
+
+def _dataset_signature():
+    signature = []
+    for path in (_airports_path(), _routes_path(), _schedules_path(), _connections_path()):
         try:
-            _ROUTE_DIRECT_CACHE, _ROUTE_INBOUND_CACHE = LoadRouteData(_routes_path())
-        except Exception:
-            _ROUTE_DIRECT_CACHE, _ROUTE_INBOUND_CACHE = {}, {}
-    return _ROUTE_DIRECT_CACHE, _ROUTE_INBOUND_CACHE
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+
+def _build_dataset(signature, version):
+    airports = LoadAirportData(_airports_path())
+    direct, inbound = LoadRouteData(_routes_path(), airports)
+    airline_ids = carriers.InternAirlines(direct, inbound)
+    hub_index = hubs.BuildHubIndex(direct, airports)
+    metro_areas = metros.BuildMetroAreas(airports, direct)
+    # Ground links join the route maps after the air-only indexes above are built
+    _add_ground_edges(direct, inbound, airports)
+    digest = _data_digest()
+    try:
+        timetable = schedule.LoadTimetable(_schedules_path(), schedule.LoadConnectionTimes(_connections_path()))
+    except Exception as exc:
+        print(f"Failed to load timetable: {exc}")
+        timetable = None
+    return {
+        "version": version,
+        "signature": signature,
+        "airports": airports,
+        "direct": direct,
+        "inbound": inbound,
+        "airline_ids": airline_ids,
+        "hubs": hub_index,
+        "metros": metro_areas,
+        "timetable": timetable,
+        "digest": digest,
+        "hub_matrix": hubmatrix.LoadHubMatrix(_hub_matrix_path(), _hub_matrix_settings(digest)),
+    }
+
+
+def _graph_version(routes):
+    entry = _GRAPH_VERSIONS.get(id(routes))
+    return entry[0] if entry is not None and entry[1] is routes else 0
+
+
+def _purge_stale_caches():
+    # Drop cache entries built from any dataset other than the active one
+    current = _DATASET["version"] if _DATASET else 0
+    for cache in (_ROUTE_DETAIL_CACHE, _REACHABLE_CACHE, _COLLECT_REACHABLE_CACHE,
+                  _EDGE_ARRAY_CACHE, _ORIGIN_TREE_CACHE, _RESULT_CACHE):
+        for key in [key for key in list(cache) if key[0] != current]:
+            cache.pop(key, None)
+
+
+def _install_dataset(dataset):
+    global _DATASET
+    with _DATASET_LOCK:
+        previous = _DATASET
+        # Keep the previous graphs registered so in-flight requests still tag their cache entries
+        keep = {dataset["version"], previous["version"] if previous else None}
+        for key, (version, _) in list(_GRAPH_VERSIONS.items()):
+            if version not in keep:
+                del _GRAPH_VERSIONS[key]
+        _GRAPH_VERSIONS[id(dataset["direct"])] = (dataset["version"], dataset["direct"])
+        _GRAPH_VERSIONS[id(dataset["inbound"])] = (dataset["version"], dataset["inbound"])
+        _DATASET = dataset
+    _purge_stale_caches()
+
+
+def _reload_in_background(signature, version):
+    global _FAILED_SIGNATURE, _RELOAD_THREAD
+    try:
+        dataset = _build_dataset(signature, version)
+    except Exception as exc:
+        print(f"Failed to reload route data (keeping version {version - 1}): {exc}")
+        _FAILED_SIGNATURE = signature
+    else:
+        _install_dataset(dataset)
+        print(f"Route data reloaded (version {version}).")
+    finally:
+        _RELOAD_THREAD = None
+
+
+def reload_dataset(wait=False):
+    """Check the data files for changes and rebuild the dataset if needed.
+
+    The new graph is built off to the side and swapped in atomically; requests
+    already running keep using the snapshot they started with.
+    """
+    global _RELOAD_THREAD, _LAST_RELOAD_CHECK
+    _LAST_RELOAD_CHECK = time.monotonic()
+    signature = _dataset_signature()
+    with _DATASET_LOCK:
+        current = _DATASET
+        if current is not None and signature == current["signature"]:
+            return current["version"]
+        if _RELOAD_THREAD is not None or (current is not None and signature == _FAILED_SIGNATURE):
+            thread = _RELOAD_THREAD
+        else:
+            version = (current["version"] if current else 0) + 1
+            thread = threading.Thread(target=_reload_in_background, args=(signature, version), daemon=True)
+            _RELOAD_THREAD = thread
+            thread.start()
+    if thread is not None and (wait or current is None):
+        thread.join()
+    return _DATASET["version"] if _DATASET else 0
+
+
+def _get_dataset():
+    if _DATASET is None or time.monotonic() - _LAST_RELOAD_CHECK >= _RELOAD_CHECK_SECONDS:
+        reload_dataset()
+    if _DATASET is None:
+        # Initial load failed; serve an empty dataset and retry on the next call
+        return {
+            "version": 0,
+            "signature": None,
+            "airports": {},
+            "direct": {},
+            "inbound": {},
+            "airline_ids": {},
+            "hubs": {},
+            "metros": {},
+            "timetable": None,
+            "digest": None,
+            "hub_matrix": None,
+        }
+    return _DATASET
+
+
+def get_dataset_version():
+    return _DATASET["version"] if _DATASET else 0
+
+
+def _get_airports():
+    return _get_dataset()["airports"]
+
+
+def _get_routes():
+    dataset = _get_dataset()
+    return dataset["direct"], dataset["inbound"]
+
+
+def _get_timetable():
+    return _get_dataset()["timetable"]
+
+
+def has_timetable():
+    """Whether a timetable (assets/schedules.dat) is loaded, so arrival deadlines apply."""
+    return _get_timetable() is not None
 
 
 def _collect_reachable_sources(dest, inbound_routes, max_stops):
-    cache_key = (dest, max_stops)
+    cache_key = (_graph_version(inbound_routes), dest, max_stops)
     cached = _COLLECT_REACHABLE_CACHE.get(cache_key)
     if cached is not None:
         return set(cached)
@@ -146,41 +428,627 @@ def _collect_reachable_sources(dest, inbound_routes, max_stops):
     return set(result)
 
 
-def compute_top10(airportCodes):
+def compute_top10(airportCodes, weights=None, arrive_by=None, depart_after=None,
+                  carriers_allowed=None, alliance=None, same_carrier=False, nearby_airports=False,
+                  max_stops=None, deadline=None):
     """Compute top 10 meeting candidates for given origin IATA codes.
 
+    `airportCodes` may repeat codes for attendees sharing an origin, or give
+    (code, weight) pairs directly; see NormaliseOrigins.
+
     Returns a tuple of (rows, metadata) where rows are:
-    [IATA, airport name, score, mean time (min), total CO2 (kg), total distance (km), connectivity summary]
+    [IATA, airport name, score, mean time (min), total CO2 (kg), total distance (km), connectivity summary,
+     Pareto rank, max time (min), 90th percentile time (min), time Gini]
+
+    `weights` maps scoring objective names (see modules.scoring.OBJECTIVES) to weights.
+    `arrive_by` (e.g. "Tue 09:00" UTC) switches travel times to scheduled journeys from
+    assets/schedules.dat and ranks candidates by how many attendees arrive in time.
+    `carriers_allowed` (airline codes) and/or `alliance` (see modules.carriers.ALLIANCES)
+    restrict every leg to those carriers; `same_carrier` requires one carrier for all legs.
+    With `nearby_airports` each attendee may depart from any airport in their metro
+    area (see modules.metros); metadata then lists the airport chosen per candidate.
+    `max_stops` (0 to _STOP_LIMIT, default _MAX_ALLOWED_STOPS) bounds connections per
+    itinerary; limits above the default are answered by meet-in-the-middle search.
+    `deadline` (seconds) bounds the request: candidates are searched most
+    promising first and the best ranking found so far is returned when time
+    runs out. Metadata "complete" says whether every candidate was searched
+    and "evaluated" / "candidates" how many of the pool were; incomplete
+    results are not cached, so a retry can finish the search.
     """
     global _LAST_RESULTS_META
 
-    airports = _get_airports()
-    routes_direct, routes_inbound = _get_routes()
+    expires = None
+    if deadline is not None:
+        expires = time.monotonic() + _check_deadline(deadline)
+    max_stops = _check_max_stops(max_stops)
+    # Hold one snapshot for the whole request so a concurrent reload cannot mix versions
+    with profiling.Span("dataset"):
+        dataset = _get_dataset()
+    airports = dataset["airports"]
+    routes_direct, routes_inbound = dataset["direct"], dataset["inbound"]
     validated = ValidateOrigins(airportCodes, airports)
     if not validated:
         meta = {"by_candidate": {}, "requested_origins": [], "ordered_candidates": []}
         _LAST_RESULTS_META = meta
         return [], meta
 
-    rows, metadata = EvaluateCandidatesRouteAware(validated, airports, routes_direct, routes_inbound)
-    top_rows = rows[:10]
-    ordered_codes = [row[0] for row in top_rows]
-    metadata["ordered_candidates"] = ordered_codes
-    metadata["by_candidate"] = {code: metadata["by_candidate"][code] for code in ordered_codes if code in metadata["by_candidate"]}
-    metadata["requested_origins"] = list(validated)
+    routing = {
+        "carrier_mask": carriers.CarrierMask(dataset["airline_ids"], carriers_allowed, alliance),
+        "same_carrier": bool(same_carrier),
+        "max_stops": max_stops,
+    }
+    query_key = _query_key(dataset["version"], validated, weights, routing, arrive_by, depart_after,
+                           nearby_airports)
+    cached = _cached_result(query_key)
+    if cached is not None:
+        with profiling.Span("result_cache_hit"):
+            rows, metadata = cached
+        _LAST_RESULTS_META = metadata
+        return rows[:10], metadata
+
+    timetable = None
+    if arrive_by is not None:
+        timetable = dataset["timetable"]
+        if timetable is None:
+            print("No timetable available; ignoring arrival deadline.")
+    rows, metadata = EvaluateCandidatesRouteAware(
+        validated,
+        airports,
+        routes_direct,
+        routes_inbound,
+        weights,
+        timetable=timetable,
+        arrive_by=arrive_by,
+        depart_after=depart_after,
+        routing=routing,
+        hub_index=dataset["hubs"],
+        metro_areas=dataset["metros"] if nearby_airports else None,
+        hub_matrix=dataset["hub_matrix"],
+        deadline=expires,
+    )
+    metadata["dataset_version"] = dataset["version"]
+    metadata["query_key"] = query_key
+    if metadata["complete"]:
+        _store_result(query_key, rows, metadata)
+    if dataset["version"] != get_dataset_version():
+        _purge_stale_caches()
+    _LAST_RESULTS_META = metadata
+    return rows[:10], metadata
+
+
+def _query_key(version, origins, weights, routing, arrive_by, depart_after, nearby_airports=False):
+    # Origins as a sorted multiset so reordered rosters share an entry; engine
+    # settings are included so changing them never serves stale rankings
+    return (
+        version,
+        tuple(sorted((code, float(weight)) for code, weight in origins)),
+        tuple(sorted((name, float(value)) for name, value in (weights or scoring.DEFAULT_WEIGHTS).items())),
+        _routing_key(routing),
+        arrive_by,
+        depart_after,
+        bool(nearby_airports),
+        (_MAX_ALLOWED_STOPS, _LAYOVER_MINUTES, _FALLBACK_PENALTY_MINUTES, _CANDIDATE_NEAREST, _CANDIDATE_HUBS,
+         _GROUND_RADIUS_KM),
+    )
+
+
+def _result_entry(query_key):
+    entry = _RESULT_CACHE.get(query_key)
+    if entry is None:
+        return None
+    if time.monotonic() - entry["created"] > _RESULT_CACHE_TTL_SECONDS:
+        _RESULT_CACHE.pop(query_key, None)
+        return None
+    _RESULT_CACHE.move_to_end(query_key)
+    return entry
+
+
+def _cached_result(query_key):
+    entry = _result_entry(query_key)
+    return (entry["rows"], entry["meta"]) if entry is not None else None
+
+
+def _store_result(query_key, rows, metadata):
+    _RESULT_CACHE[query_key] = {"created": time.monotonic(), "rows": rows, "meta": metadata, "summaries": {}}
+    _RESULT_CACHE.move_to_end(query_key)
+    while len(_RESULT_CACHE) > _RESULT_CACHE_SIZE:
+        _RESULT_CACHE.popitem(last=False)
+
+
+def get_cached_summary(meta, hub):
+    """AI summary stored for `hub` under the query that produced `meta`, or None."""
+    entry = _result_entry(meta.get("query_key")) if isinstance(meta, dict) else None
+    return entry["summaries"].get(hub) if entry is not None else None
+
+
+def store_summary(meta, hub, text):
+    """Remember the AI summary for `hub` alongside the cached query result."""
+    entry = _result_entry(meta.get("query_key")) if isinstance(meta, dict) else None
+    if entry is not None and text:
+        entry["summaries"][hub] = text
+
+
+def clear_result_cache():
+    _RESULT_CACHE.clear()
+
+
+def clear_search_caches():
+    """Drop cached query results, route details, reachability sets and origin trees.
+
+    Long batch jobs call this between chunks to keep memory bounded; the
+    next queries simply search again.
+    """
+    global _LAST_RESULTS_META
+
+    _RESULT_CACHE.clear()
+    _ROUTE_DETAIL_CACHE.clear()
+    _REACHABLE_CACHE.clear()
+    _COLLECT_REACHABLE_CACHE.clear()
+    _ORIGIN_TREE_CACHE.clear()
+    _LAST_RESULTS_META = {"by_candidate": {}, "requested_origins": [], "ordered_candidates": []}
+
+
+def build_hub_matrix(count=_HUB_MATRIX_HUBS):
+    """Precompute itineraries from every airport to the `count` best hubs into assets/hub_matrix.
+
+    Queries then read cells whose candidate is one of those hubs instead of
+    searching them. The matrix is tied to the route data and engine settings
+    and is ignored once either changes. Returns the directory written.
+    """
+    dataset = _get_dataset()
+    edges = _edge_arrays(dataset["direct"])
+    hub_codes = [code for code in hubs.TopHubs(dataset["hubs"], count) if code in edges["index"]]
+    matrix = hubmatrix.BuildHubMatrix(edges, hub_codes, _MAX_ALLOWED_STOPS, _LAYOVER_MINUTES)
+    settings = _hub_matrix_settings(dataset["digest"])
+    path = _hub_matrix_path()
+    hubmatrix.SaveHubMatrix(path, matrix, edges["codes"], hub_codes, settings)
+    dataset["hub_matrix"] = hubmatrix.LoadHubMatrix(path, settings)
+    clear_result_cache()
+    return path
+
+
+def rescore_last(weights=None):
+    """Re-rank the most recent compute_top10 result with new scoring weights.
+
+    Reuses the cached metric matrix, so no routes are searched again.
+    """
+    global _LAST_RESULTS_META
+
+    evaluation = _LAST_RESULTS_META.get("evaluation")
+    if not evaluation:
+        return [], _LAST_RESULTS_META
+    rows, metadata = RankEvaluation(evaluation, weights)
+    # Same query and routes, so AI summaries cached per hub still apply
+    for key in ("dataset_version", "query_key"):
+        if key in _LAST_RESULTS_META:
+            metadata[key] = _LAST_RESULTS_META[key]
     _LAST_RESULTS_META = metadata
-    return top_rows, metadata
+    return rows[:10], metadata
+
+
+class EvaluationSession:
+    """Keeps one roster's metric matrix between edits so adding or removing an
+    attendee only searches that origin's column.
+
+    The candidate pool is kept while every pool airport stays reachable from all
+    origins. It is rebuilt (from the warm route caches) only when an edit shrinks
+    the reachability intersection below the pool, moves the roster's centroid
+    too far, changes the dataset version, or when refresh() is called. "Too
+    far" is _SESSION_POOL_DRIFT_KM or _SESSION_POOL_DRIFT_SPREAD times the
+    roster's spread (mean attendee distance from the centroid) when the pool
+    was built, whichever is larger, so worldwide rosters keep their pool across
+    edits. A kept pool can differ from the pool compute_top10 would select for
+    the edited roster, so results are cached under compute_top10's key plus the
+    session's pool: AI summaries stored for them are found again, but
+    compute_top10 never serves a session ranking. Arrival deadlines and nearby
+    airports are not supported; use compute_top10 for those.
+    """
+
+    def __init__(self, weights=None, carriers_allowed=None, alliance=None, same_carrier=False, max_stops=None):
+        self.weights = weights
+        self.carriers_allowed = carriers_allowed
+        self.alliance = alliance
+        self.same_carrier = same_carrier
+        self.max_stops = _check_max_stops(max_stops)
+        self.dataset = None
+        self.routing = None
+        self.pool = None
+        self.centroid = None
+        self.drift_km = _SESSION_POOL_DRIFT_KM
+        self.intersection = None
+        self.metrics = None
+        self.routes = None
+        self.names = None
+        self.stats = {"column_builds": 0, "pool_builds": 0}
+
+    def update(self, airportCodes):
+        """Bring the session to the given roster and return (rows[:10], meta) like compute_top10."""
+        global _LAST_RESULTS_META
+
+        dataset = _get_dataset()
+        origins = ValidateOrigins(airportCodes, dataset["airports"])
+        if not origins:
+            meta = {"by_candidate": {}, "requested_origins": [], "ordered_candidates": []}
+            _LAST_RESULTS_META = meta
+            return [], meta
+
+        if self.dataset is None or dataset["version"] != self.dataset["version"]:
+            self.dataset = dataset
+            self.routing = {
+                "carrier_mask": carriers.CarrierMask(dataset["airline_ids"], self.carriers_allowed, self.alliance),
+                "same_carrier": bool(self.same_carrier),
+                "max_stops": self.max_stops,
+            }
+            self.pool = None
+
+        wanted = dict(origins)
+        centroid = _origin_centroid(origins, dataset["airports"])
+        if self.pool is not None and centroid and self.centroid:
+            if HaversineDistance(*self.centroid, *centroid) > self.drift_km:
+                self.pool = None
+        if self.pool is not None:
+            current = dict(zip(self.metrics["origins"], self.metrics["weights"]))
+            for code in [code for code in current if code not in wanted]:
+                self._remove_column(code)
+            for code, weight in origins:
+                if self.pool is None:
+                    break
+                if code not in current:
+                    self._add_column(code, weight)
+        if self.pool is None:
+            self._build(origins)
+        else:
+            # Headcount changes only touch the weights; put columns in roster order
+            order = [self.metrics["origins"].index(code) for code, _ in origins]
+            metrics = dict(self.metrics)
+            for key in _MATRIX_KEYS:
+                metrics[key] = metrics[key][:, order]
+            metrics["origins"] = [code for code, _ in origins]
+            metrics["weights"] = np.array([weight for _, weight in origins], dtype=float)
+            self.metrics = metrics
+        return self.rank()
+
+    def refresh(self):
+        """Rebuild the candidate pool for the current roster."""
+        origins = list(zip(self.metrics["origins"], self.metrics["weights"])) if self.metrics else []
+        self.pool = None
+        return self.update(origins)
+
+    def rank(self, weights=None):
+        global _LAST_RESULTS_META
+
+        if weights is not None:
+            self.weights = weights
+        evaluation = {"metrics": self.metrics, "routes": self.routes, "names": self.names}
+        rows, metadata = RankEvaluation(evaluation, self.weights)
+        metadata["dataset_version"] = self.dataset["version"]
+        origins = list(zip(self.metrics["origins"], self.metrics["weights"]))
+        metadata["query_key"] = _query_key(
+            self.dataset["version"], origins, self.weights, self.routing, None, None
+        ) + (("session", tuple(self.pool)),)
+        _store_result(metadata["query_key"], rows, metadata)
+        _LAST_RESULTS_META = metadata
+        return rows[:10], metadata
+
+    def _reach(self, code):
+        reachable = _reachable_destinations(code, self.dataset["direct"], _max_stops(self.routing))
+        reachable.add(code)
+        return reachable
+
+    def _build(self, origins):
+        dataset = self.dataset
+        airports = dataset["airports"]
+        self.pool = _select_candidate_codes(
+            origins, airports, dataset["direct"], dataset["hubs"], _max_stops(self.routing), dataset["inbound"]
+        )
+        self.centroid = _origin_centroid(origins, airports)
+        self.drift_km = _SESSION_POOL_DRIFT_KM
+        if self.centroid:
+            spread = fairness.WeightedMean(
+                np.array([[HaversineDistance(*self.centroid, airports[code]["lat"], airports[code]["lon"])
+                           for code, _ in origins]]),
+                [weight for _, weight in origins],
+            )[0]
+            self.drift_km = max(_SESSION_POOL_DRIFT_KM, _SESSION_POOL_DRIFT_SPREAD * float(spread))
+        self.intersection = set.intersection(*(self._reach(code) for code, _ in origins))
+        self.metrics, self.routes = _build_metric_matrix(
+            origins, self.pool, airports, dataset["direct"], dataset["inbound"], self.routing
+        )
+        self.names = [airports[code]["name"] for code in self.metrics["codes"]]
+        self.stats["pool_builds"] += 1
+        self.stats["column_builds"] += len(origins)
+
+    def _add_column(self, code, weight):
+        intersection = self.intersection & self._reach(code)
+        if not intersection or not intersection.issuperset(self.metrics["codes"]):
+            self.pool = None
+            return
+        self.intersection = intersection
+        dataset = self.dataset
+        column, column_routes = _build_metric_matrix(
+            [(code, weight)], self.metrics["codes"], dataset["airports"], dataset["direct"], dataset["inbound"],
+            self.routing,
+        )
+        metrics = dict(self.metrics)
+        for key in _MATRIX_KEYS:
+            metrics[key] = np.concatenate([metrics[key], column[key]], axis=1)
+        metrics["origins"] = metrics["origins"] + [code]
+        metrics["weights"] = np.append(metrics["weights"], float(weight))
+        self.metrics = metrics
+        self.routes = [dict(routes, **extra) for routes, extra in zip(self.routes, column_routes)]
+        self.stats["column_builds"] += 1
+
+    def _remove_column(self, code):
+        col = self.metrics["origins"].index(code)
+        metrics = dict(self.metrics)
+        for key in _MATRIX_KEYS:
+            metrics[key] = np.delete(metrics[key], col, axis=1)
+        metrics["origins"] = metrics["origins"][:col] + metrics["origins"][col + 1:]
+        metrics["weights"] = np.delete(metrics["weights"], col)
+        self.metrics = metrics
+        self.routes = [{origin: detail for origin, detail in routes.items() if origin != code} for routes in self.routes]
+        if not metrics["origins"]:
+            self.pool = None
+            return
+        # The intersection can only grow; the pool stays valid
+        self.intersection = set.intersection(*(self._reach(origin) for origin in metrics["origins"]))
+
+
+def select_venues_last(k, objective="time", exact=None):
+    """Split the attendees of the most recent compute_top10 query across `k` venues.
+
+    Runs on the cached metric matrix (see modules.venues.SelectVenues), so no
+    routes are searched. Returns (rows, result): one row per venue followed by a
+    totals row, each [IATA, name, attendees, mean time, total CO2, total
+    distance, assigned origins, venue number, max time, p90 time, time Gini].
+    `k` must be at least 1 and is capped at the number of candidates.
+    """
+    if int(k) < 1:
+        raise ValueError(f"Number of venues must be at least 1, got {k}")
+    evaluation = _LAST_RESULTS_META.get("evaluation")
+    if not evaluation or not evaluation["metrics"]["codes"]:
+        return [], None
+    metrics = evaluation["metrics"]
+    result = venues.SelectVenues(metrics, k, objective=objective, exact=exact)
+    weight_by_origin = dict(zip(metrics["origins"], metrics["weights"]))
+
+    def _origin_label(code):
+        weight = _count_value(weight_by_origin[code])
+        return code if weight == 1 else f"{code} x{weight}"
+
+    rows = []
+    for number, venue in enumerate(result["venues"], start=1):
+        rows.append(
+            [
+                venue["code"],
+                evaluation["names"][metrics["codes"].index(venue["code"])],
+                _count_value(venue["attendees"]),
+                round(venue["mean_time"], 3),
+                round(venue["total_co2"], 3),
+                round(venue["total_distance"], 3),
+                ", ".join(_origin_label(code) for code in venue["origins"]),
+                number,
+                round(venue["max_time"], 3),
+                round(venue["p90_time"], 3),
+                round(venue["gini_time"], 4),
+            ]
+        )
+    totals = result["totals"]
+    rows.append(
+        [
+            "ALL",
+            f"{len(result['venues'])} venues ({result['solver']})",
+            _count_value(totals["attendees"]),
+            round(totals["mean_time"], 3),
+            round(totals["total_co2"], 3),
+            round(totals["total_distance"], 3),
+            f"min total {result['objective']}",
+            "",
+            round(totals["max_time"], 3),
+            round(totals["p90_time"], 3),
+            round(totals["gini_time"], 4),
+        ]
+    )
+    return rows, result
+
+
+def sweep(airportCodes, variants):
+    """Rank one roster under many parameter sets, searching routes once per distinct routing.
+
+    Each variant is a dict with any of "name", "weights" (a dict or a
+    scoring.PRESETS name), "fallback_penalty" (minutes) and the routing options
+    "max_stops", "layover_minutes", "carriers_allowed", "alliance" and
+    "same_carrier"; missing keys take the compute_top10 defaults. Variants that
+    share routing options share one metric matrix, and only the fallback
+    penalty and scoring are recomputed per variant (route details keep the
+    default penalty).
+
+    Returns {"variants": [{"name", "rows", "meta"}], "comparison": rows,
+    "routings": distinct routings searched}. Comparison rows are [IATA, name,
+    rank in each variant...] for every candidate in any variant's top ten, best
+    mean rank first; a rank is None when the candidate is not in that variant's
+    pool.
+    """
+    dataset = _get_dataset()
+    airports = dataset["airports"]
+    validated = ValidateOrigins(airportCodes, airports)
+    if not validated:
+        return {"variants": [], "comparison": [], "routings": 0}
+
+    evaluations = {}
+    results = []
+    for position, variant in enumerate(variants):
+        unknown = set(variant) - set(_SWEEP_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown sweep parameters: {', '.join(sorted(unknown))}")
+        routing = {
+            "carrier_mask": carriers.CarrierMask(
+                dataset["airline_ids"], variant.get("carriers_allowed"), variant.get("alliance")
+            ),
+            "same_carrier": bool(variant.get("same_carrier", False)),
+            "max_stops": _check_max_stops(variant.get("max_stops")),
+            "layover_minutes": _check_minutes("layover_minutes", variant.get("layover_minutes")),
+        }
+        key = _routing_key(routing)
+        evaluation = evaluations.get(key)
+        if evaluation is None:
+            _, meta = EvaluateCandidatesRouteAware(
+                validated, airports, dataset["direct"], dataset["inbound"], routing=routing,
+                hub_index=dataset["hubs"], hub_matrix=dataset["hub_matrix"],
+            )
+            evaluation = evaluations[key] = meta["evaluation"]
+        penalty = _check_minutes("fallback_penalty", variant.get("fallback_penalty"))
+        if penalty is not None and penalty != _FALLBACK_PENALTY_MINUTES:
+            evaluation = _with_fallback_penalty(evaluation, penalty)
+        weights = variant.get("weights")
+        if isinstance(weights, str):
+            weights = scoring.PRESETS[weights]
+        rows, meta = RankEvaluation(evaluation, weights)
+        results.append({"name": variant.get("name") or f"variant {position + 1}", "rows": rows, "meta": meta})
+
+    ranks = [{row[0]: number for number, row in enumerate(result["rows"], start=1)} for result in results]
+    names = {row[0]: row[1] for result in results for row in result["rows"]}
+    shown = dict.fromkeys(row[0] for result in results for row in result["rows"][:10])
+
+    def _mean_rank(code):
+        found = [rank[code] for rank in ranks if code in rank]
+        return (sum(found) / len(found) if found else float("inf"), code)
+
+    comparison = [
+        [code, names[code]] + [rank.get(code) for rank in ranks] for code in sorted(shown, key=_mean_rank)
+    ]
+    return {"variants": results, "comparison": comparison, "routings": len(evaluations)}
+
+
+def score_surface(airportCodes, weights=None, alliance=None, max_stops=None, refine=_SURFACE_REFINE):
+    """Score every airport in airports.dat for a roster, for drawing as a map overlay.
+
+    All ~7k airports are first scored from lower-bound metrics (see
+    surface.EstimateMetrics), computed for every airport at once. The best
+    estimated airports are then evaluated route-aware, `refine` at a time and
+    with the same routing options as compute_top10, until
+    _SURFACE_REFINE_LIMIT airports have been searched. When every weighted
+    objective is in scoring.MONOTONE_OBJECTIVES (and weighted positively) the
+    estimates bound the true scores from above, so refinement also stops
+    once the best refined score beats every remaining estimate. Other
+    airports keep their estimates.
+
+    Returns {"codes", "lat", "lon", "score", "refined"} (arrays aligned with
+    "codes"; "refined" marks route-aware scores), "cells" (see
+    surface.SurfaceCells, on a _SURFACE_CELL_DEGREES grid) and "best" (the
+    best refined airport), or None for an invalid roster.
+    """
+    dataset = _get_dataset()
+    airports = dataset["airports"]
+    validated = ValidateOrigins(airportCodes, airports)
+    if not validated:
+        return None
+    routing = {
+        "carrier_mask": carriers.CarrierMask(dataset["airline_ids"], None, alliance),
+        "same_carrier": False,
+        "max_stops": _check_max_stops(max_stops),
+    }
+    with profiling.Span("surface_estimate"):
+        estimate = surface.EstimateMetrics(
+            validated, list(airports), airports, dataset["direct"], dataset["inbound"], _LAYOVER_MINUTES,
+            _FALLBACK_PENALTY_MINUTES,
+        )
+        scores, _ = scoring.ScoreCandidates(estimate, weights)
+    codes = estimate["codes"]
+    bounded = all(
+        name in scoring.MONOTONE_OBJECTIVES and weight > 0
+        for name, weight in (scoring.DEFAULT_WEIGHTS if weights is None else weights).items()
+        if weight
+    )
+    # Ties broken by code so the refined region does not depend on dict order
+    order = np.lexsort((np.array(codes), -scores))
+    refined = np.zeros(len(codes), dtype=bool)
+    scores = scores.copy()
+    best = None
+    start = 0
+    batch = max(1, int(refine))
+    with profiling.Span("surface_refine"):
+        while start < min(len(order), _SURFACE_REFINE_LIMIT):
+            if bounded and best is not None and scores[best] >= scores[order[start]]:
+                break
+            region = order[start:start + batch]
+            metrics, _ = _build_metric_matrix(
+                validated, [codes[index] for index in region], airports, dataset["direct"], dataset["inbound"],
+                routing, dataset["hub_matrix"],
+            )
+            scores[region], _ = scoring.ScoreCandidates(metrics, weights)
+            refined[region] = True
+            leader = int(region[np.argmax(scores[region])])
+            if best is None or scores[leader] > scores[best]:
+                best = leader
+            start += batch
+    return {
+        "codes": codes,
+        "lat": estimate["lat"],
+        "lon": estimate["lon"],
+        "score": scores,
+        "refined": refined,
+        "cells": surface.SurfaceCells(estimate["lat"], estimate["lon"], scores, _SURFACE_CELL_DEGREES),
+        "best": codes[best] if best is not None else None,
+    }
+
+
+def _check_deadline(seconds):
+    seconds = float(seconds)
+    if not 0.0 < seconds < float("inf"):
+        raise ValueError(f"deadline must be a positive number of seconds, got {seconds}")
+    return seconds
+
+
+def _check_minutes(name, minutes):
+    if minutes is None:
+        return None
+    minutes = float(minutes)
+    if not 0.0 <= minutes < float("inf"):
+        raise ValueError(f"{name} must be a non-negative number of minutes, got {minutes}")
+    return minutes
+
+
+def _with_fallback_penalty(evaluation, penalty_minutes):
+    # Fallback cells carry the penalty in their time, so only those cells shift
+    metrics = dict(evaluation["metrics"])
+    fallback = metrics["availability"] == scoring.AVAILABILITY_CODES["fallback"]
+    metrics["time"] = metrics["time"] + np.where(fallback, penalty_minutes - _FALLBACK_PENALTY_MINUTES, 0.0)
+    return dict(evaluation, metrics=metrics)
+
+
+def NormaliseOrigins(airportCodes):
+    """Collapse attendee origins into unique (code, weight) pairs.
+
+    Accepts a list of codes (repeated codes count once per attendee), a list of
+    (code, weight) pairs, or a {code: weight} dict. Weights are headcounts or
+    priority weights; pairs keep the order in which codes first appear.
+    """
+    items = airportCodes.items() if isinstance(airportCodes, dict) else airportCodes
+    merged = {}
+    for item in items or []:
+        if isinstance(item, (tuple, list)):
+            code, weight = item[0], float(item[1])
+        else:
+            code, weight = item, 1.0
+        code = str(code).strip().upper()
+        merged[code] = merged.get(code, 0.0) + weight
+    return list(merged.items())
 
 
 def ValidateOrigins(airportCodes, airports):
-    origins = len(airportCodes)
-    if origins > numOrigins or origins < 2:
-        print(f"Invalid number of origins. Must be between 2 and {numOrigins}.")
+    origins = NormaliseOrigins(airportCodes)
+    attendees = sum(weight for _, weight in origins)
+    if len(origins) > numOrigins or (len(origins) < 2 and attendees < 2):
+        print(f"Invalid number of origins. Must be between 2 and {numOrigins} airports.")
+        return False
+
+    if not all(math.isfinite(weight) and weight > 0 for _, weight in origins):
+        print("Invalid attendee weights. Weights must be positive finite numbers.")
         return False
 
     invalidCodes = []
-    for code in airportCodes:
-        code = code.upper()
+    for code, _ in origins:
         if code not in airports:
             invalidCodes.append(code)
 
@@ -189,7 +1057,7 @@ def ValidateOrigins(airportCodes, airports):
         return False
 
     print("All airport codes are valid.")
-    return [code.upper() for code in airportCodes]
+    return origins
 
 
 def HaversineDistance(lat1, lon1, lat2, lon2):
@@ -219,14 +1087,12 @@ def CalculateTime(distance):
     return 40 + ((distance * 60) / cruiseSpeed)
 
 
-def CalculateCO2Emissions(distance):
-    emissionsFactor = 115 / 1000
-    emissions = distance * emissionsFactor
-    return emissions
+def CalculateCO2Emissions(distance, equipment=None):
+    return emissions.LegEmissions(distance, equipment)
 
 
 def _reachable_destinations(origin, direct_routes, max_stops):
-    cache_key = (origin, max_stops)
+    cache_key = (_graph_version(direct_routes), origin, max_stops)
     cached = _REACHABLE_CACHE.get(cache_key)
     if cached is not None:
         return set(cached)
@@ -260,27 +1126,63 @@ def _reachable_destinations(origin, direct_routes, max_stops):
 
 
 def _origin_centroid(origins, airports):
-    coords = []
-    for code in origins:
+    # Weighted mean of the origins' unit vectors, so rosters spanning the
+    # antimeridian or both hemispheres get a centre on the globe between them
+    vector = np.zeros(3)
+    for code, weight in origins:
         info = airports.get(code)
         if not info:
             continue
-        coords.append((float(info["lat"]), float(info["lon"])))
-    if not coords:
+        lat, lon = np.radians(float(info["lat"])), np.radians(float(info["lon"]))
+        vector += weight * np.array([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+    norm = np.linalg.norm(vector)
+    if norm <= 1e-9:
         return None
-    lat = sum(c[0] for c in coords) / len(coords)
-    lon = sum(c[1] for c in coords) / len(coords)
-    return (lat, lon)
+    x, y, z = vector / norm
+    return (float(np.degrees(np.arcsin(np.clip(z, -1.0, 1.0)))), float(np.degrees(np.arctan2(y, x))))
+
+
+def _select_candidate_codes(origins, airports, direct_routes, hub_index=None, max_stops=None, inbound_routes=None,
+                            deadline=None):
+    """Candidate meeting airports for the given (code, weight) origins.
+
+    Without `hub_index` the pool is trimmed to the 80-200 airports nearest the
+    origin centroid. With a hub index (see modules.hubs) it keeps the
+    _CANDIDATE_NEAREST nearest airports plus the _CANDIDATE_HUBS hubs the
+    roster reaches best: most attendees with at most one connection (from
+    `inbound_routes`), then quality discounted by distance from the centroid.
+    A `max_stops` above the default widens the reachable set, so the default
+    pool is kept as well; allowing more stops never drops a candidate.
+    Returns [] if `deadline` (time.monotonic()) passes before the pool is chosen.
+    """
+    if max_stops is not None and max_stops > _MAX_ALLOWED_STOPS and origins:
+        pool = _select_candidate_codes(
+            origins, airports, direct_routes, hub_index, inbound_routes=inbound_routes, deadline=deadline
+        )
+        chosen = set(pool)
+        wider = _select_candidate_codes_within(
+            origins, airports, direct_routes, hub_index, max_stops, inbound_routes, deadline
+        )
+        if not pool or not wider:
+            return []
+        return pool + [code for code in wider if code not in chosen]
+    return _select_candidate_codes_within(
+        origins, airports, direct_routes, hub_index, max_stops, inbound_routes, deadline
+    )
 
 
-def _select_candidate_codes(origins, airports, direct_routes):
+def _select_candidate_codes_within(origins, airports, direct_routes, hub_index, max_stops, inbound_routes,
+                                   deadline=None):
     if not origins:
         return list(airports.keys())
 
     reachable_sets = []
-    for raw in origins:
-        code = raw.upper()
-        reachable = _reachable_destinations(code, direct_routes, _MAX_ALLOWED_STOPS)
+    for code, _ in origins:
+        if deadline is not None and time.monotonic() >= deadline:
+            return []
+        reachable = _reachable_destinations(
+            code, direct_routes, _MAX_ALLOWED_STOPS if max_stops is None else max_stops
+        )
         reachable.add(code)
         reachable_sets.append(reachable)
 
@@ -295,6 +1197,11 @@ def _select_candidate_codes(origins, airports, direct_routes):
         filtered = list(airports.keys())
 
     centroid = _origin_centroid(origins, airports)
+    if deadline is not None and time.monotonic() >= deadline:
+        return []
+    if hub_index is not None and centroid:
+        return _mix_nearest_and_hubs(filtered, centroid, airports, hub_index, origins, direct_routes, inbound_routes)
+
     limit_upper = 200
     limit_lower = 80
     limit = max(limit_lower, min(limit_upper, len(filtered)))
@@ -315,6 +1222,38 @@ def _select_candidate_codes(origins, airports, direct_routes):
     return filtered
 
 
+def _roster_reach(code, origins, direct_routes, inbound_routes):
+    # Attendees whose origin reaches `code` directly or with one connection
+    sources = inbound_routes.get(code) or {}
+    return sum(
+        weight
+        for origin, weight in origins
+        if origin == code or origin in sources or not direct_routes.get(origin, {}).keys().isdisjoint(sources)
+    )
+
+
+def _mix_nearest_and_hubs(codes, centroid, airports, hub_index, origins, direct_routes, inbound_routes=None):
+    lat0, lon0 = centroid
+    distances = {
+        code: HaversineDistance(lat0, lon0, airports[code]["lat"], airports[code]["lon"]) for code in codes
+    }
+    ordered = sorted(codes, key=lambda code: (distances[code], code))
+    nearest = ordered[:_CANDIDATE_NEAREST]
+    chosen = set(nearest)
+    hubs = [code for code in ordered[_CANDIDATE_NEAREST:] if code in hub_index]
+    reach = {}
+    if inbound_routes is not None:
+        reach = {code: _roster_reach(code, origins, direct_routes, inbound_routes) for code in hubs}
+    hubs.sort(
+        key=lambda code: (
+            -reach.get(code, 0.0),
+            -hub_index[code]["quality"] / (1.0 + distances[code] / _HUB_DISTANCE_SCALE_KM),
+            code,
+        )
+    )
+    return nearest + [code for code in hubs[:_CANDIDATE_HUBS] if code not in chosen]
+
+
 def _format_connectivity_summary(stats):
     order = [
         ("direct", "Direct"),
@@ -323,6 +1262,9 @@ def _format_connectivity_summary(stats):
         ("fallback", "Fallback"),
     ]
     parts = [f"{label} {stats.get(key, 0)}" for key, label in order]
+    for key, label in (("three_stop", "3-stop"), ("four_stop", "4-stop"), ("ground", "Ground")):
+        if stats.get(key, 0):
+            parts.insert(-1, f"{label} {stats[key]}")
     if stats.get("same", 0):
         parts.append(f"Local {stats['same']}")
     return " | ".join(parts)
@@ -332,7 +1274,7 @@ def _fallback_route(origin, dest, airports):
     origin_data = airports.get(origin)
     dest_data = airports.get(dest)
 
-    segments = []
+    segments = ()
     distance = 0.0
     base_time = 0.0
     co2 = 0.0
@@ -340,144 +1282,288 @@ def _fallback_route(origin, dest, airports):
         distance = HaversineDistance(origin_data["lat"], origin_data["lon"], dest_data["lat"], dest_data["lon"])
         base_time = CalculateTime(distance)
         co2 = CalculateCO2Emissions(distance)
-        segments.append({
-            "from": origin,
-            "to": dest,
-            "distance": distance,
-            "time": base_time,
-            "airlines": 0,
-        })
+        segments = (RouteSegment(origin, dest, distance, base_time, 0),)
 
     total_time = base_time + _FALLBACK_PENALTY_MINUTES
-    return {
-        "availability": "fallback",
-        "legs": len(segments) if segments else 1,
-        "stops": 0,
-        "path": [origin, dest],
-        "segments": segments,
-        "distance": distance,
-        "time": total_time,
-        "co2": co2,
-        "airlines": 0,
-        "penalty_minutes": _FALLBACK_PENALTY_MINUTES,
-        "layover_minutes": _FALLBACK_PENALTY_MINUTES,
-    }
+    return RouteDetail(
+        "fallback",
+        len(segments) if segments else 1,
+        0,
+        (origin, dest),
+        segments,
+        distance,
+        total_time,
+        co2,
+        0,
+        layover_minutes=_FALLBACK_PENALTY_MINUTES,
+        penalty_minutes=_FALLBACK_PENALTY_MINUTES,
+    )
+
+
+def _routing_key(routing):
+    # Hashable cache key part for the routing options; () for unrestricted routing
+    carrier_mask = routing.get("carrier_mask") if routing else None
+    same_carrier = bool(routing.get("same_carrier")) if routing else False
+    max_stops = _max_stops(routing)
+    layover_minutes = _layover_minutes(routing)
+    if (
+        carrier_mask is None
+        and not same_carrier
+        and max_stops == _MAX_ALLOWED_STOPS
+        and layover_minutes == _LAYOVER_MINUTES
+    ):
+        return ()
+    return (carrier_mask, same_carrier, max_stops, layover_minutes)
+
+
+def _check_max_stops(max_stops):
+    if max_stops is None:
+        return None
+    max_stops = int(max_stops)
+    if not 0 <= max_stops <= _STOP_LIMIT:
+        raise ValueError(f"max_stops must be between 0 and {_STOP_LIMIT}, got {max_stops}")
+    return max_stops
+
+
+def _max_stops(routing):
+    max_stops = routing.get("max_stops") if routing else None
+    return _MAX_ALLOWED_STOPS if max_stops is None else int(max_stops)
 
 
-def _search_best_route(origin, dest, airports, direct_routes, inbound_routes, max_stops):
+def _layover_minutes(routing):
+    layover_minutes = routing.get("layover_minutes") if routing else None
+    return _LAYOVER_MINUTES if layover_minutes is None else float(layover_minutes)
+
+
+def _search_best_route(origin, dest, airports, direct_routes, inbound_routes, max_stops,
+                       carrier_mask=None, same_carrier=False, astar=None, layover_minutes=None):
+    """Fastest itinerary with at most `max_stops` connections, or None.
+
+    `carrier_mask` restricts every leg to the carriers in the bitmask (see
+    modules.carriers); with `same_carrier` one carrier must fly all legs.
+    `layover_minutes` (default _LAYOVER_MINUTES) is added at every connection.
+
+    With `astar` (default _USE_ASTAR) states are ordered by elapsed time plus the
+    direct great-circle CalculateTime to `dest`. That never overestimates the
+    remaining time (every leg costs at least 40 minutes and legs are at least as
+    long as the great circle), so the first itinerary popped is still the fastest.
+    States that cannot beat the best itinerary seen so far, or that cannot reach
+    `dest` within the remaining legs, are never pushed.
+    """
+    if astar is None:
+        astar = _USE_ASTAR
+    if layover_minutes is None:
+        layover_minutes = _LAYOVER_MINUTES
     reachable = _collect_reachable_sources(dest, inbound_routes, max_stops)
     if origin != dest and origin not in reachable and direct_routes.get(origin, {}).get(dest) is None:
         return None
 
-    availability_labels = {0: "direct", 1: "one_stop", 2: "two_stop"}
+    max_legs = max_stops + 1
 
-    initial_state = (0.0, 0.0, 0.0, [origin], [], 0)
-    heap = [initial_state]
+    dest_data = airports.get(dest)
+    heuristic_cache = {dest: 0.0}
+    # reach_within[k]: airports that reach dest in at most k legs
+    reach_within = [None, set()]
+    if astar:
+        reach_within[1] = set(inbound_routes.get(dest, {}))
+        for remaining in range(2, max_legs):
+            reach_within.append(_collect_reachable_sources(dest, inbound_routes, remaining - 1))
+    best_found = float("inf")
+
+    def _heuristic(code):
+        value = heuristic_cache.get(code)
+        if value is None:
+            code_data = airports.get(code)
+            value = 0.0
+            if code_data and dest_data:
+                value = CalculateTime(
+                    HaversineDistance(code_data["lat"], code_data["lon"], dest_data["lat"], dest_data["lon"])
+                )
+            heuristic_cache[code] = value
+        return value
+
+    # Heap entries are (priority, time, distance, co2, sequence, label); labels share parents
+    initial_priority = _heuristic(origin) if astar else 0.0
+    initial_label = SearchLabel(origin, None, 0, 0.0, 0.0, 0.0, 0.0, carriers=-1 if carrier_mask is None else carrier_mask)
+    heap = [(initial_priority, 0.0, 0.0, 0.0, 0, initial_label)]
     visited = {}
+    pushes = 1
+    pops = 0
 
     while heap:
-        total_time, total_distance, total_co2, path, segments, layovers = heapq.heappop(heap)
-        current = path[-1]
-        legs = len(path) - 1
-        state_key = (current, legs)
+        label = heapq.heappop(heap)[5]
+        pops += 1
+        current = label.airport
+        legs = label.legs
+        total_time = label.time
+        state_key = (current, legs, label.carriers) if same_carrier else (current, legs)
         best_seen = visited.get(state_key)
         if best_seen is not None and total_time >= best_seen - 1e-6:
             continue
         visited[state_key] = total_time
 
         if current == dest and legs > 0:
-            stops = len(path) - 2
+            stops = legs - 1
             if stops <= max_stops:
-                availability = availability_labels.get(stops, "two_stop")
-                avg_airlines = 0.0
-                if segments:
-                    avg_airlines = sum(seg.get("airlines", 0) for seg in segments) / len(segments)
-                return {
-                    "availability": availability,
-                    "legs": len(segments),
-                    "stops": stops,
-                    "path": path,
-                    "segments": segments,
-                    "distance": total_distance,
-                    "time": total_time,
-                    "co2": total_co2,
-                    "airlines": round(avg_airlines, 3),
-                    "layover_minutes": layovers,
-                }
+                _record_search(pushes, pops)
+                ground_only = all(item.leg_airlines == 0 for item in label.chain()[1:])
+                return RouteDetail.from_label(label, "ground" if ground_only else scoring.STOP_AVAILABILITY[stops])
             continue
 
-        if legs >= max_stops + 1:
+        if legs >= max_legs:
             continue
 
         neighbors = direct_routes.get(current, {})
         if not neighbors:
             continue
-        current_data = airports.get(current)
-        if not current_data:
-            continue
-
+        remaining_legs = max_legs - legs - 1
+        layover_time = layover_minutes if legs > 0 else 0.0
         for nxt, info in neighbors.items():
-            if nxt in path:
-                continue
             if nxt != dest and nxt not in reachable:
                 continue
-            nxt_data = airports.get(nxt)
-            if not nxt_data:
+            if astar and nxt != dest and (remaining_legs == 0 or nxt not in reach_within[remaining_legs]):
+                continue
+            leg_distance = info["distance"]
+            if leg_distance is None:
+                continue
+            next_carriers = label.carriers
+            # Ground legs are open to every itinerary and do not constrain the carrier
+            if (carrier_mask is not None or same_carrier) and info.get("mode") != "ground":
+                leg_carriers = info["mask"] if carrier_mask is None else info["mask"] & carrier_mask
+                if same_carrier:
+                    leg_carriers &= label.carriers
+                if not leg_carriers:
+                    continue
+                if same_carrier:
+                    next_carriers = leg_carriers
+            if label.visits(nxt):
                 continue
 
-            leg_distance = HaversineDistance(current_data["lat"], current_data["lon"], nxt_data["lat"], nxt_data["lon"])
-            leg_time = CalculateTime(leg_distance)
-            leg_co2 = CalculateCO2Emissions(leg_distance)
-            layover_time = _LAYOVER_MINUTES if len(path) > 1 else 0.0
+            leg_time = info["time"]
             new_total_time = total_time + layover_time + leg_time
-            new_total_distance = total_distance + leg_distance
-            new_total_co2 = total_co2 + leg_co2
-            new_layovers = layovers + (layover_time if layover_time else 0.0)
-            airlines_count = len(info.get("airlines", ())) if info.get("airlines") else 0
-            segment = {
-                "from": current,
-                "to": nxt,
-                "distance": leg_distance,
-                "time": leg_time,
-                "airlines": airlines_count,
-            }
-            new_segments = segments + [segment]
-            new_path = path + [nxt]
-            if len(new_path) - 2 > max_stops:
-                continue
+            priority = new_total_time
+            if astar:
+                priority += _heuristic(nxt)
+                if priority > best_found + 1e-6:
+                    continue
+                if nxt == dest and new_total_time < best_found:
+                    best_found = new_total_time
+            if carrier_mask is not None:
+                airlines_count = bin(info["mask"] & carrier_mask).count("1")
+            else:
+                airlines_count = len(info.get("airlines", ())) if info.get("airlines") else 0
+            new_total_distance = label.distance + leg_distance
+            new_total_co2 = label.co2 + info["co2"]
+            pushes += 1
             heapq.heappush(
                 heap,
                 (
+                    priority,
                     new_total_time,
                     new_total_distance,
                     new_total_co2,
-                    new_path,
-                    new_segments,
-                    new_layovers,
+                    pushes,
+                    SearchLabel(
+                        nxt,
+                        label,
+                        legs + 1,
+                        new_total_time,
+                        new_total_distance,
+                        new_total_co2,
+                        label.layovers + layover_time,
+                        leg_distance,
+                        leg_time,
+                        airlines_count,
+                        next_carriers,
+                    ),
                 ),
             )
 
+    _record_search(pushes, pops)
     return None
 
 
-def _compute_route_detail(origin, dest, airports, direct_routes, inbound_routes):
-    cache_key = (origin, dest)
+def _record_search(pushes, pops):
+    _SEARCH_STATS["searches"] += 1
+    _SEARCH_STATS["pushes"] += pushes
+    _SEARCH_STATS["pops"] += pops
+
+
+def get_search_stats(reset=False):
+    """Counters of route searches, heap pushes/pops and origin trees built/reused since the last reset."""
+    stats = dict(_SEARCH_STATS)
+    if reset:
+        for key in _SEARCH_STATS:
+            _SEARCH_STATS[key] = 0
+    return stats
+
+
+def _edge_arrays(direct_routes, carrier_mask=None):
+    cache_key = (_graph_version(direct_routes), carrier_mask)
+    edges = _EDGE_ARRAY_CACHE.get(cache_key)
+    if edges is None:
+        edges = trees.EdgeArrays(direct_routes, carrier_mask)
+        _EDGE_ARRAY_CACHE[cache_key] = edges
+    return edges
+
+
+def _origin_tree(origin, direct_routes, carrier_mask=None, max_stops=None, reverse=False, layover_minutes=None):
+    """Cached bounded-hop shortest-path tree from `origin` and the edge arrays it indexes.
+
+    With `reverse` the tree holds the fastest itineraries *to* `origin`.
+    Trees are kept least-recently-used first and evicted once their arrays exceed
+    _ORIGIN_TREE_BUDGET_BYTES, so frequently queried origins stay resident.
+    """
+    if max_stops is None:
+        max_stops = _MAX_ALLOWED_STOPS
+    if layover_minutes is None:
+        layover_minutes = _LAYOVER_MINUTES
+    edges = _edge_arrays(direct_routes, carrier_mask)
+    cache_key = (_graph_version(direct_routes), origin, carrier_mask, max_stops, reverse, layover_minutes)
+    tree = _ORIGIN_TREE_CACHE.get(cache_key)
+    if tree is not None:
+        _ORIGIN_TREE_CACHE.move_to_end(cache_key)
+        _SEARCH_STATS["tree_hits"] += 1
+        return tree, edges
+
+    tree = trees.BuildTree(edges, origin, max_stops, layover_minutes, reverse=reverse)
+    _SEARCH_STATS["trees"] += 1
+    if tree is None:
+        return None, edges
+    _ORIGIN_TREE_CACHE[cache_key] = tree
+    used = sum(item["nbytes"] for item in _ORIGIN_TREE_CACHE.values())
+    while used > _ORIGIN_TREE_BUDGET_BYTES and len(_ORIGIN_TREE_CACHE) > 1:
+        _, evicted = _ORIGIN_TREE_CACHE.popitem(last=False)
+        used -= evicted["nbytes"]
+    return tree, edges
+
+
+def _meet_in_middle_route(origin, dest, direct_routes, carrier_mask, max_stops, layover_minutes):
+    # Split the legs between a forward tree from the origin and a reverse tree
+    # into the destination; both are half depth and cached for reuse
+    legs = max_stops + 1
+    forward_legs = (legs + 1) // 2
+    forward, edges = _origin_tree(origin, direct_routes, carrier_mask, forward_legs - 1,
+                                  layover_minutes=layover_minutes)
+    backward, _ = _origin_tree(dest, direct_routes, carrier_mask, legs - forward_legs - 1, reverse=True,
+                               layover_minutes=layover_minutes)
+    if forward is None or backward is None:
+        return None
+    return trees.MeetRoute(edges, forward, backward, layover_minutes)
+
+
+def _compute_route_detail(origin, dest, airports, direct_routes, inbound_routes, routing=None):
+    cache_key = (_graph_version(direct_routes), origin, dest, _routing_key(routing))
+    carrier_mask = routing.get("carrier_mask") if routing else None
+    same_carrier = bool(routing.get("same_carrier")) if routing else False
+    max_stops = _max_stops(routing)
+    layover_minutes = _layover_minutes(routing)
     cached = _ROUTE_DETAIL_CACHE.get(cache_key)
     if cached is not None:
         return cached
 
     if origin == dest:
-        detail = {
-            "availability": "same",
-            "legs": 0,
-            "stops": 0,
-            "path": [origin],
-            "segments": [],
-            "distance": 0.0,
-            "time": 0.0,
-            "co2": 0.0,
-            "airlines": 0,
-        }
+        detail = RouteDetail("same", 0, 0, (origin,), (), 0.0, 0.0, 0.0, 0)
         _ROUTE_DETAIL_CACHE[cache_key] = detail
         return detail
 
@@ -489,29 +1575,51 @@ def _compute_route_detail(origin, dest, airports, direct_routes, inbound_routes)
         return detail
 
     direct_info = direct_routes.get(origin, {}).get(dest)
+    if direct_info and carrier_mask is not None and not direct_info["mask"] & carrier_mask:
+        direct_info = None
+    # A ground link is not necessarily faster than a connection, so let the search decide
+    if direct_info and direct_info.get("mode") == "ground":
+        direct_info = None
     if direct_info:
-        dist = HaversineDistance(origin_data["lat"], origin_data["lon"], dest_data["lat"], dest_data["lon"])
-        time = CalculateTime(dist)
-        co2 = CalculateCO2Emissions(dist)
-        airlines = len(direct_info.get("airlines", ())) if direct_info.get("airlines") else 0
-        detail = {
-            "availability": "direct",
-            "legs": 1,
-            "stops": 0,
-            "path": [origin, dest],
-            "segments": [
-                {"from": origin, "to": dest, "distance": dist, "time": time, "airlines": airlines},
-            ],
-            "distance": dist,
-            "time": time,
-            "co2": co2,
-            "airlines": airlines,
-            "layover_minutes": 0.0,
-        }
+        dist = direct_info["distance"]
+        time = direct_info["time"]
+        co2 = direct_info["co2"]
+        if carrier_mask is not None:
+            airlines = bin(direct_info["mask"] & carrier_mask).count("1")
+        else:
+            airlines = len(direct_info.get("airlines", ())) if direct_info.get("airlines") else 0
+        detail = RouteDetail(
+            "direct",
+            1,
+            0,
+            (origin, dest),
+            (RouteSegment(origin, dest, dist, time, airlines),),
+            dist,
+            time,
+            co2,
+            airlines,
+            layover_minutes=0.0,
+        )
         _ROUTE_DETAIL_CACHE[cache_key] = detail
         return detail
 
-    multi_stop = _search_best_route(origin, dest, airports, direct_routes, inbound_routes, _MAX_ALLOWED_STOPS)
+    if _USE_ORIGIN_TREES and not same_carrier and max_stops > _MAX_ALLOWED_STOPS:
+        multi_stop = _meet_in_middle_route(origin, dest, direct_routes, carrier_mask, max_stops, layover_minutes)
+    elif _USE_ORIGIN_TREES and not same_carrier:
+        tree, edges = _origin_tree(origin, direct_routes, carrier_mask, max_stops, layover_minutes=layover_minutes)
+        multi_stop = trees.TreeRoute(edges, tree, dest, layover_minutes) if tree is not None else None
+    else:
+        multi_stop = _search_best_route(
+            origin,
+            dest,
+            airports,
+            direct_routes,
+            inbound_routes,
+            max_stops,
+            carrier_mask=carrier_mask,
+            same_carrier=same_carrier,
+            layover_minutes=layover_minutes,
+        )
     if multi_stop:
         _ROUTE_DETAIL_CACHE[cache_key] = multi_stop
         return multi_stop
@@ -521,100 +1629,350 @@ def _compute_route_detail(origin, dest, airports, direct_routes, inbound_routes)
     return detail
 
 
-def EvaluateCandidatesRouteAware(airportCodes, airports, routes_direct, routes_inbound):
-    total_origins = len(airportCodes)
-    candidate_entries = []
-
-    candidate_codes = _select_candidate_codes(airportCodes, airports, routes_direct)
+class _RouteRows:
+    """Per-candidate {origin: RouteDetail} rows whose hub-matrix cells are searched on first access.
 
-    for cand_code in candidate_codes:
-        cand_data = airports.get(cand_code)
-        if not cand_data:
-            continue
-        total_distance = 0.0
-        total_time = 0.0
-        total_co2 = 0.0
-        stats_counts = {
-            "direct": 0,
-            "one_stop": 0,
-            "two_stop": 0,
-            "fallback": 0,
-            "same": 0,
-        }
-        direct_airlines_sum = 0
-        direct_airlines_count = 0
-        candidate_routes = {}
+    Ranking only needs route details for the rows it shows, so rows answered
+    from the matrix stay incomplete until someone reads them. Once `deadline`
+    (time.monotonic()) has passed no more details are searched, and rows read
+    after that lack the origins not yet resolved.
+    """
 
-        for origin_code in airportCodes:
-            detail = _compute_route_detail(origin_code, cand_code, airports, routes_direct, routes_inbound)
+    def __init__(self, rows, origins, codes, resolve, deadline=None):
+        self._rows = rows
+        self._origins = origins
+        self._codes = codes
+        self._resolve = resolve
+        self._deadline = deadline
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __getitem__(self, index):
+        row = self._rows[index]
+        if len(row) < len(self._origins):
+            for origin in self._origins:
+                if origin not in row:
+                    if self._deadline is not None and time.monotonic() >= self._deadline:
+                        return {origin: row[origin] for origin in self._origins if origin in row}
+                    row[origin] = self._resolve(origin, self._codes[index])
+            self._rows[index] = {origin: row[origin] for origin in self._origins}
+        return self._rows[index]
+
+    def __iter__(self):
+        for index in range(len(self._rows)):
+            yield self[index]
+
+
+def _build_metric_matrix(origins, candidate_codes, airports, routes_direct, routes_inbound, routing=None,
+                         hub_matrix=None, priority=None, deadline=None):
+    # Rows are searched in `priority` order (candidate codes) when given; once
+    # `deadline` (time.monotonic()) passes, checked before every searched cell,
+    # the rows not fully searched are dropped (all of them if the deadline passed
+    # before the first row finished). Kept rows stay in candidate order.
+    codes = [code for code in candidate_codes if airports.get(code)]
+    shape = (len(codes), len(origins))
+    metrics = {
+        "codes": codes,
+        "origins": [code for code, _ in origins],
+        "weights": np.array([weight for _, weight in origins], dtype=float),
+        "time": np.zeros(shape),
+        "distance": np.zeros(shape),
+        "co2": np.zeros(shape),
+        "stops": np.zeros(shape, dtype=np.int8),
+        "availability": np.zeros(shape, dtype=np.int8),
+        "airlines": np.zeros(shape),
+    }
+    covered = None
+    # The matrix holds default-routing itineraries from the tree engine only
+    if hub_matrix is not None and _USE_HUB_MATRIX and _USE_ORIGIN_TREES and _routing_key(routing) == ():
+        gathered, covered = hubmatrix.GatherHubMatrix(hub_matrix, metrics["origins"], codes)
+        metrics.update(gathered)
+    order = range(len(codes))
+    if priority is not None:
+        position = {code: index for index, code in enumerate(codes)}
+        order = [position[code] for code in priority if code in position]
+    routes = [{} for _ in codes]
+    searched = 0
+    expired = False
+    for row_index in order:
+        cand_code = codes[row_index]
+        candidate_routes = routes[row_index]
+        for col_index, origin_code in enumerate(metrics["origins"]):
+            if covered is not None and covered[row_index, col_index]:
+                continue
+            if deadline is not None and time.monotonic() >= deadline:
+                expired = True
+                break
+            detail = _compute_route_detail(origin_code, cand_code, airports, routes_direct, routes_inbound, routing)
             candidate_routes[origin_code] = detail
-            total_distance += detail["distance"]
-            total_time += detail["time"]
-            total_co2 += detail["co2"]
-
-            availability = detail["availability"]
-            stats_counts[availability] = stats_counts.get(availability, 0) + 1
-
-            if availability == "direct" and detail.get("airlines"):
-                direct_airlines_sum += detail["airlines"]
-                direct_airlines_count += 1
-
-        avg_distance = total_distance / total_origins if total_origins else 0.0
-        avg_time = total_time / total_origins if total_origins else 0.0
-        score = 1 - (avg_distance / 15000.0)
-        connectivity_penalty = 0.0
-        if total_origins:
-            connectivity_penalty += 0.04 * (stats_counts.get("one_stop", 0) / total_origins)
-            connectivity_penalty += 0.08 * (stats_counts.get("two_stop", 0) / total_origins)
-            connectivity_penalty += 0.16 * (stats_counts.get("fallback", 0) / total_origins)
-        score -= connectivity_penalty
-        if score < 0:
-            score = 0.0
-        elif score > 1:
-            score = 1.0
+            metrics["time"][row_index, col_index] = detail.time
+            metrics["distance"][row_index, col_index] = detail.distance
+            metrics["co2"][row_index, col_index] = detail.co2
+            metrics["stops"][row_index, col_index] = detail.stops
+            metrics["availability"][row_index, col_index] = scoring.AVAILABILITY_CODES[detail.availability]
+            metrics["airlines"][row_index, col_index] = detail.airlines or 0
+        if expired:
+            break
+        searched += 1
+    if searched < len(codes):
+        kept = np.sort(np.asarray(list(order)[:searched], dtype=np.int64))
+        codes = metrics["codes"] = [codes[index] for index in kept]
+        for key in _MATRIX_KEYS:
+            metrics[key] = metrics[key][kept]
+        routes = [routes[index] for index in kept]
+        if covered is not None:
+            covered = covered[kept]
+    if covered is not None and covered.any():
+        routes = _RouteRows(
+            routes,
+            metrics["origins"],
+            codes,
+            lambda origin, dest: _compute_route_detail(origin, dest, airports, routes_direct, routes_inbound, routing),
+            deadline,
+        )
+    return metrics, routes
 
-        connectivity_summary = _format_connectivity_summary(stats_counts)
-        avg_airlines = (direct_airlines_sum / direct_airlines_count) if direct_airlines_count else 0.0
-
-        row = [
-            cand_code,
-            cand_data["name"],
-            round(score, 3),
-            round(avg_time, 3),
-            round(total_co2, 3),
-            round(total_distance, 3),
-            connectivity_summary,
-        ]
 
-        candidate_entries.append(
-            {
-                "row": row,
-                "detail": {
-                    "stats": stats_counts.copy(),
-                    "routes": candidate_routes,
-                    "avg_airlines": round(avg_airlines, 3),
-                    "connectivity_summary": connectivity_summary,
-                    "aggregates": {
-                        "score": score,
-                        "mean_time": avg_time,
-                        "total_co2": total_co2,
-                        "total_distance": total_distance,
-                        "penalty": connectivity_penalty,
-                    },
+def _count_value(value):
+    value = float(value)
+    return int(round(value)) if abs(value - round(value)) < 1e-9 else round(value, 3)
+
+
+def RankEvaluation(evaluation, weights=None):
+    """Score and rank a cached evaluation without searching any routes.
+
+    Returns (rows, meta) in the same shape as EvaluateCandidatesRouteAware.
+    """
+    metrics = evaluation["metrics"]
+    codes = metrics["codes"]
+    origin_weights = metrics["weights"]
+    total_origins = float(origin_weights.sum())
+
+    if "late" in metrics:
+        weights = dict(scoring.DEFAULT_WEIGHTS if weights is None else weights)
+        weights.setdefault("late_arrivals", 1.0)
+    scores, penalties = scoring.ScoreCandidates(metrics, weights)
+    pareto_ranks = scoring.ParetoRanks(scoring.ObjectiveValues(metrics, scoring.PARETO_OBJECTIVES))
+    burden = fairness.FairnessStats(metrics)
+    total_distance = metrics["distance"] @ origin_weights
+    total_co2 = metrics["co2"] @ origin_weights
+    total_time = metrics["time"] @ origin_weights
+    avg_time = total_time / total_origins if total_origins else np.zeros(len(codes))
+
+    availability = metrics["availability"]
+    class_counts = np.stack(
+        [(availability == code) @ origin_weights for code in range(len(scoring.AVAILABILITY_NAMES))],
+        axis=1,
+    )
+    direct_mask = (availability == scoring.AVAILABILITY_CODES["direct"]) & (metrics["airlines"] > 0)
+    direct_airlines_count = direct_mask @ origin_weights
+    direct_airlines_sum = np.where(direct_mask, metrics["airlines"], 0.0) @ origin_weights
+
+    order = scoring.RankOrder(scores, total_distance, avg_time)
+    rows = []
+    details = {}
+    for index in order:
+        cand_code = codes[index]
+        stats_counts = {
+            scoring.AVAILABILITY_NAMES[code]: _count_value(class_counts[index, code])
+            for code in range(class_counts.shape[1])
+        }
+        connectivity_summary = _format_connectivity_summary(stats_counts)
+        avg_airlines = (
+            float(direct_airlines_sum[index]) / float(direct_airlines_count[index])
+            if direct_airlines_count[index]
+            else 0.0
+        )
+        score = float(scores[index])
+        rows.append(
+            [
+                cand_code,
+                evaluation["names"][index],
+                round(score, 3),
+                round(float(avg_time[index]), 3),
+                round(float(total_co2[index]), 3),
+                round(float(total_distance[index]), 3),
+                connectivity_summary,
+                int(pareto_ranks[index]),
+                round(float(burden["max_time"][index]), 3),
+                round(float(burden["p90_time"][index]), 3),
+                round(float(burden["gini_time"][index]), 4),
+            ]
+        )
+        if len(details) < 10:
+            details[cand_code] = {
+                "stats": stats_counts,
+                "routes": {origin: detail.to_dict() for origin, detail in evaluation["routes"][index].items()},
+                "avg_airlines": round(avg_airlines, 3),
+                "connectivity_summary": connectivity_summary,
+                "pareto_rank": int(pareto_ranks[index]),
+                "origin_times": metrics["time"][index],
+                "origin_co2": metrics["co2"][index],
+                "fairness": {name: float(values[index]) for name, values in burden.items()},
+                "schedule": _schedule_detail(evaluation, index) if "schedule" in evaluation else None,
+                "departures": evaluation["departures"][index] if "departures" in evaluation else None,
+                "on_time": (
+                    _count_value(metrics["weights"] @ (1.0 - metrics["late"][index])) if "late" in metrics else None
+                ),
+                "aggregates": {
+                    "score": score,
+                    "mean_time": float(avg_time[index]),
+                    "total_co2": float(total_co2[index]),
+                    "total_distance": float(total_distance[index]),
+                    "penalty": float(penalties[index]),
                 },
             }
-        )
 
-    candidate_entries.sort(key=lambda item: (-item["row"][2], item["row"][5], item["row"][3]))
-    rows = [item["row"] for item in candidate_entries]
     meta = {
-        "by_candidate": {item["row"][0]: item["detail"] for item in candidate_entries[:10]},
-        "requested_origins": list(airportCodes),
-        "ordered_candidates": [item["row"][0] for item in candidate_entries[:10]],
+        "by_candidate": details,
+        "requested_origins": list(metrics["origins"]),
+        "origins": list(zip(metrics["origins"], (_count_value(weight) for weight in origin_weights))),
+        "ordered_candidates": [row[0] for row in rows[:10]],
+        "pareto_frontier": [codes[index] for index in order if pareto_ranks[index] == 1],
+        "weights": dict(scoring.DEFAULT_WEIGHTS if weights is None else weights),
+        "complete": evaluation.get("complete", True),
+        "evaluated": len(codes),
+        "candidates": evaluation.get("candidates", len(codes)),
+        "evaluation": evaluation,
     }
     return rows, meta
 
 
+def _apply_schedule(metrics, timetable, arrive_by, depart_after):
+    # Replace modelled times with scheduled journey times where the timetable has one
+    deadline = schedule.DeadlineMatrix(timetable, metrics["origins"], metrics["codes"], arrive_by, depart_after)
+    scheduled = np.isfinite(deadline["journey"])
+    metrics["time"] = np.where(scheduled, deadline["journey"], metrics["time"])
+    metrics["late"] = (~deadline["on_time"]).astype(float)
+    return deadline
+
+
+def _schedule_detail(evaluation, index):
+    timetable = evaluation["timetable"]
+    deadline = evaluation["schedule"]
+    metrics = evaluation["metrics"]
+    cand_code = metrics["codes"][index]
+    detail = {}
+    departures = evaluation["departures"][index] if "departures" in evaluation else {}
+    for col, origin in enumerate(metrics["origins"]):
+        departure = departures.get(origin, origin)
+        path, flights = schedule.JourneyPath(timetable, deadline["scans"][departure], departure, cand_code)
+        arrival = deadline["arrival"][index, col]
+        journey = deadline["journey"][index, col]
+        detail[origin] = {
+            "on_time": bool(deadline["on_time"][index, col]),
+            "path": path,
+            "flights": flights,
+            "departure": schedule.FormatWeekTime(arrival - journey) if np.isfinite(arrival) else None,
+            "arrival": schedule.FormatWeekTime(arrival) if np.isfinite(arrival) else None,
+        }
+    return detail
+
+
+def _merge_metro_columns(evaluation, origins, groups):
+    # Collapse one column per departure airport into one per requested origin,
+    # keeping the airport with the fastest (and, with a deadline, on-time) journey
+    metrics = evaluation["metrics"]
+    column = {code: col for col, code in enumerate(metrics["origins"])}
+    ranking = metrics["time"] + (metrics["late"] * 1e9 if "late" in metrics else 0.0)
+    choice = np.empty((len(metrics["codes"]), len(origins)), dtype=np.int64)
+    for position, (code, _) in enumerate(origins):
+        members = np.array([column[member] for member in groups[code]])
+        # argmin keeps the first (requested) airport on ties
+        choice[:, position] = members[np.argmin(ranking[:, members], axis=1)]
+
+    rows = np.arange(len(metrics["codes"]))[:, None]
+    for key in ("time", "distance", "co2", "stops", "availability", "airlines", "late"):
+        if key in metrics:
+            metrics[key] = metrics[key][rows, choice]
+    deadline = evaluation.get("schedule")
+    if deadline is not None:
+        for key in ("journey", "arrival", "stops", "on_time"):
+            deadline[key] = deadline[key][rows, choice]
+    member_codes = metrics["origins"]
+    metrics["origins"] = [code for code, _ in origins]
+    metrics["weights"] = np.array([weight for _, weight in origins], dtype=float)
+
+    routes = []
+    departures = []
+    for index, candidate_routes in enumerate(evaluation["routes"]):
+        chosen = {code: member_codes[choice[index, position]] for position, (code, _) in enumerate(origins)}
+        routes.append({code: candidate_routes[departure] for code, departure in chosen.items()})
+        departures.append(chosen)
+    evaluation["routes"] = routes
+    evaluation["departures"] = departures
+
+
+def _promise_order(origins, candidate_codes, airports, routes_direct, routes_inbound, weights):
+    # Candidates by optimistic estimated score (see surface.EstimateMetrics), best first
+    codes = [code for code in candidate_codes if airports.get(code)]
+    estimate = surface.EstimateMetrics(
+        origins, codes, airports, routes_direct, routes_inbound, _LAYOVER_MINUTES, _FALLBACK_PENALTY_MINUTES
+    )
+    scores, _ = scoring.ScoreCandidates(estimate, weights)
+    return [codes[index] for index in np.lexsort((np.array(codes), -scores))]
+
+
+def EvaluateCandidatesRouteAware(airportCodes, airports, routes_direct, routes_inbound, weights=None,
+                                 timetable=None, arrive_by=None, depart_after=None, routing=None,
+                                 hub_index=None, metro_areas=None, hub_matrix=None, deadline=None):
+    """Rank candidate meeting airports for the given origins.
+
+    With `metro_areas` (see modules.metros) every airport in an origin's metro area
+    gets its own column of route lookups; each attendee is then assigned, per
+    candidate, whichever of those columns is fastest. The pool is still selected
+    from the requested airports. With `hub_matrix` (see modules.hubmatrix)
+    cells whose candidate is a precomputed hub are read from it instead of
+    being searched. With a `deadline` (a time.monotonic() value) candidates are
+    searched most promising first (see _promise_order) and the search stops
+    when the deadline passes; the ranking then covers only the candidates
+    searched so far (possibly none), and the metadata's "complete" flag is
+    False. Pool selection checks the deadline between origins, promise ordering is skipped once the deadline has passed, route
+    searches check it cell by cell, and the top rows' route details that the
+    hub matrix left unsearched are only looked up while time remains.
+    """
+    origins = NormaliseOrigins(airportCodes)
+    with profiling.Span("candidate_selection"):
+        candidate_codes = _select_candidate_codes(
+            origins, airports, routes_direct, hub_index, _max_stops(routing), routes_inbound, deadline
+        )
+    groups = metros.OriginGroups(origins, metro_areas) if metro_areas else None
+    if groups and any(len(members) > 1 for members in groups.values()):
+        departure_codes = list(dict.fromkeys(member for code, _ in origins for member in groups[code]))
+        columns = [(code, 1.0) for code in departure_codes]
+    else:
+        groups = None
+        columns = origins
+    priority = None
+    if deadline is not None:
+        priority = []
+        if time.monotonic() < deadline:
+            priority = _promise_order(columns, candidate_codes, airports, routes_direct, routes_inbound, weights)
+    with profiling.Span("route_matrix", candidates=len(candidate_codes), origins=len(columns)):
+        metrics, routes = _build_metric_matrix(
+            columns, candidate_codes, airports, routes_direct, routes_inbound, routing, hub_matrix,
+            priority=priority, deadline=deadline,
+        )
+    candidates = sum(1 for code in candidate_codes if airports.get(code))
+    evaluation = {
+        "metrics": metrics,
+        "routes": routes,
+        "names": [airports[code]["name"] for code in metrics["codes"]],
+        "candidates": candidates,
+        # An empty pool only comes from a deadline passing during selection
+        "complete": bool(candidate_codes) and len(metrics["codes"]) == candidates,
+    }
+    if timetable is not None and arrive_by is not None:
+        evaluation["timetable"] = timetable
+        with profiling.Span("schedule"):
+            evaluation["schedule"] = _apply_schedule(metrics, timetable, arrive_by, depart_after)
+    if groups:
+        _merge_metro_columns(evaluation, origins, groups)
+    with profiling.Span("rank"):
+        return RankEvaluation(evaluation, weights)
+
+
 def EvaluateCandidatesFixed(airportCodes, airports):
     routes_direct, routes_inbound = _get_routes()
     rows, _ = EvaluateCandidatesRouteAware(airportCodes, airports, routes_direct, routes_inbound)
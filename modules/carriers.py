@@ -0,0 +1,50 @@
+# IATA airline codes of alliance members (full members, not affiliates).
+ALLIANCES = {
+    "Star Alliance": frozenset(
+        "A3 AC AI AV BR CA CM ET LH LO LX MS NH NZ OS OU OZ SA SN SQ TG TK TP UA ZH".split()
+    ),
+    "oneworld": frozenset("AA AS AT AY BA CX FJ IB JL MH QF QR RJ UL WY".split()),
+    "SkyTeam": frozenset(
+        "AF AM AR CI DL GA KE KL KQ ME MF MU RO SK SV UX VN VS".split()
+    ),
+}
+
+
+def InternAirlines(*route_maps):
+    """Give every airline a bit index and store each edge's carriers as an int bitmask.
+
+    Sets info["mask"] on every edge of the given route maps and returns the
+    {airline code: bit index} table.
+    """
+    airline_ids = {}
+    for routes in route_maps:
+        for neighbours in routes.values():
+            for info in neighbours.values():
+                mask = 0
+                for airline in info.get("airlines", ()):
+                    bit = airline_ids.setdefault(airline, len(airline_ids))
+                    mask |= 1 << bit
+                info["mask"] = mask
+    return airline_ids
+
+
+def CarrierMask(airline_ids, carriers=None, alliance=None):
+    """Bitmask of the allowed carriers, or None when every carrier is allowed."""
+    if not carriers and not alliance:
+        return None
+    allowed = set(str(code).strip().upper() for code in (carriers or ()))
+    if alliance:
+        if alliance not in ALLIANCES:
+            raise KeyError(f"Unknown alliance: {alliance}")
+        allowed |= ALLIANCES[alliance]
+    mask = 0
+    for code in allowed:
+        bit = airline_ids.get(code)
+        if bit is not None:
+            mask |= 1 << bit
+    return mask
+
+
+def MaskCarriers(airline_ids, mask):
+    """Airline codes contained in `mask`, sorted."""
+    return sorted(code for code, bit in airline_ids.items() if mask >> bit & 1)
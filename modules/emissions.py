@@ -0,0 +1,86 @@
+# Per-passenger CO2 model: a cruise factor (g/km) that depends on the aircraft
+# category and distance band, plus a fixed landing/take-off (LTO) overhead per leg.
+# The LTO cycle burns a similar amount of fuel regardless of leg length, so it
+# dominates on short hops.
+
+DEFAULT_CATEGORY = "default"
+
+CATEGORY_FACTORS = {
+    # category: (cruise g CO2 per passenger-km, LTO kg CO2 per passenger)
+    "turboprop": (95.0, 8.0),
+    "regional": (125.0, 12.0),
+    "narrowbody": (88.0, 15.0),
+    "widebody": (92.0, 22.0),
+    "superjumbo": (100.0, 28.0),
+    "piston": (140.0, 6.0),
+    DEFAULT_CATEGORY: (100.0, 15.0),
+}
+
+# (upper bound km, cruise multiplier). Long legs carry more fuel weight.
+DISTANCE_BANDS = (
+    (500.0, 1.15),
+    (1500.0, 1.0),
+    (4000.0, 0.95),
+    (float("inf"), 1.05),
+)
+
+EQUIPMENT_CATEGORIES = {}
+for _category, _codes in {
+    "turboprop": (
+        "AT4 AT5 AT7 ATR ATP AN4 DH1 DH2 DH3 DH4 DH7 DH8 DHT DHP SF3 F50 J31 J32 J41 "
+        "BEH BE1 BEC BET BE9 D28 D38 S20 SWM SFB EM2 EMB L4T A40 YN7 YK2 I14 CN1"
+    ),
+    "regional": (
+        "CRJ CR1 CR2 CR7 CR9 CRA CRK ER3 ER4 ERD ERJ EMJ E70 E75 E90 E95 E7W "
+        "AR1 AR8 ARJ 146 142 143 F70 F28 100 SU9 FRJ YK4"
+    ),
+    "narrowbody": (
+        "318 319 320 321 32A 32B 32S 32N 32Q 313 310 717 732 733 734 735 736 737 738 739 "
+        "73C 73G 73H 73J 73M 73N 73Q 73R 73W 7M8 7M9 752 753 757 75W 75T "
+        "M80 M82 M83 M87 M88 M90 DC9 D93 D1C TU5"
+    ),
+    "widebody": (
+        "330 332 333 340 342 343 345 346 350 359 351 762 763 764 767 76W "
+        "772 773 777 77L 77W 787 788 789 AB4 AB6 M11 IL9 L10 TU3"
+    ),
+    "superjumbo": "380 388 744 747 74E 74H 74M",
+    "piston": "BNI BNT PA2 PAG PL2 CNA CNC CNT YN2 T20 A81 A58",
+}.items():
+    for _code in _codes.split():
+        EQUIPMENT_CATEGORIES[_code] = _category
+
+
+def _band_multiplier(distance):
+    for upper, multiplier in DISTANCE_BANDS:
+        if distance < upper:
+            return multiplier
+    return 1.0
+
+
+def LegEmissions(distance, equipment=None):
+    """Per-passenger kg CO2 for a single flight leg of `distance` km.
+
+    `equipment` is an IATA aircraft code (routes.dat column 9) or an iterable of
+    codes flown on the route, in which case the factors are averaged.
+    """
+    if distance <= 1e-6:
+        return 0.0
+    if isinstance(equipment, str):
+        equipment = (equipment,)
+    categories = [EQUIPMENT_CATEGORIES.get(code, DEFAULT_CATEGORY) for code in (equipment or ())]
+    if not categories:
+        categories = [DEFAULT_CATEGORY]
+    cruise = sum(CATEGORY_FACTORS[category][0] for category in categories) / len(categories)
+    lto = sum(CATEGORY_FACTORS[category][1] for category in categories) / len(categories)
+    return lto + distance * cruise * _band_multiplier(distance) / 1000.0
+
+
+# Blended rail/coach factor for ground legs, g CO2 per passenger-km travelled.
+GROUND_FACTOR = 40.0
+
+
+def GroundEmissions(distance):
+    """Per-passenger kg CO2 for a ground leg travelling `distance` km (no LTO overhead)."""
+    if distance <= 1e-6:
+        return 0.0
+    return distance * GROUND_FACTOR / 1000.0
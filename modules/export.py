@@ -0,0 +1,192 @@
+import glob
+import os
+
+import numpy as np
+
+from modules import backend
+
+# Columnar export of evaluation results for batch analysis. Each chunk file is
+# an uncompressed .npz holding the rosters written since the previous chunk,
+# flattened CSR-style: per-roster offsets index into the origin, candidate and
+# (candidate x origin) cell columns.
+
+_CHUNK_ROSTERS = 256
+_PATH_SEPARATOR = "-"
+# Aggregate columns and their position in a RankEvaluation row
+_AGGREGATES = {
+    "score": 2,
+    "mean_time": 3,
+    "total_co2": 4,
+    "total_distance": 5,
+    "max_time": 8,
+    "p90_time": 9,
+    "gini_time": 10,
+}
+
+
+def _roster_columns(rows, evaluation, roster_id, with_paths=True):
+    metrics = evaluation["metrics"]
+    codes = list(metrics["codes"])
+    by_code = {row[0]: (position, row) for position, row in enumerate(rows)}
+    ordered = [by_code[code] for code in codes]
+    columns = {
+        "roster": np.array([roster_id]),
+        "origins": np.array(metrics["origins"]),
+        "weights": np.asarray(metrics["weights"], dtype=np.float32),
+        "codes": np.array(codes),
+        "rank": np.array([position for position, _ in ordered], dtype=np.int32),
+        "pareto": np.array([row[7] for _, row in ordered], dtype=np.int16),
+        "time": metrics["time"].astype(np.float32).ravel(),
+        "co2": metrics["co2"].astype(np.float32).ravel(),
+        "distance": metrics["distance"].astype(np.float32).ravel(),
+        "availability": metrics["availability"].astype(np.int8).ravel(),
+        "stops": metrics["stops"].astype(np.int8).ravel(),
+    }
+    for name, position in _AGGREGATES.items():
+        columns[name] = np.array([row[position] for _, row in ordered], dtype=np.float32)
+    if not with_paths:
+        # Reading lazy route rows would search every cell answered from the hub matrix
+        columns["paths"] = [""] * len(columns["time"])
+        return columns
+    paths = []
+    for candidate_routes in evaluation["routes"]:
+        for origin in metrics["origins"]:
+            detail = candidate_routes.get(origin)
+            paths.append(_PATH_SEPARATOR.join(detail.path) if detail is not None else "")
+    columns["paths"] = paths
+    return columns
+
+
+def _next_chunk(directory):
+    # One past the highest existing part number, so gaps or reruns never overwrite a chunk
+    numbers = []
+    for path in glob.glob(os.path.join(directory, "part-*.npz")):
+        stem = os.path.basename(path)[len("part-"):-len(".npz")]
+        if stem.isdigit():
+            numbers.append(int(stem))
+    return max(numbers) + 1 if numbers else 0
+
+
+def _concat_chunk(pending):
+    chunk = {}
+    for name, count_of in (("origin_offsets", "origins"), ("candidate_offsets", "codes"), ("cell_offsets", "time")):
+        chunk[name] = np.concatenate([[0], np.cumsum([len(columns[count_of]) for columns in pending])]).astype(np.int64)
+    for name in pending[0]:
+        if name != "paths":
+            chunk[name] = np.concatenate([columns[name] for columns in pending])
+    # Dictionary-encode paths: most cells of a batch share a few thousand itineraries
+    paths = [path for columns in pending for path in columns["paths"]]
+    values, index = np.unique(np.array(paths), return_inverse=True)
+    chunk["path_values"] = values
+    chunk["path_index"] = index.astype(np.int32)
+    return chunk
+
+
+class ResultWriter:
+    """Streams evaluation results for many rosters into a directory of .npz chunks.
+
+    Only the rosters since the last chunk are held in memory; a chunk is
+    written every `chunk_rosters` rosters and on close(), numbered after the
+    highest chunk already in `directory`. With `paths` False the itinerary
+    paths are written empty, so cells answered from the hub matrix are not
+    searched just to export them. Use as a context manager, or call close()
+    when done.
+    """
+
+    def __init__(self, directory, chunk_rosters=_CHUNK_ROSTERS, paths=True):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.chunk_rosters = chunk_rosters
+        self.paths = paths
+        self.chunks = _next_chunk(directory)
+        self.written = 0
+        self.rosters = 0
+        self._pending = []
+
+    def add(self, meta, roster_id=None):
+        """Buffer the result whose metadata is `meta` (from compute_top10 or a session).
+
+        compute_top10 returns only ten rows, so every candidate is re-ranked from
+        the cached evaluation with the result's weights. `roster_id` defaults to
+        the result's query key.
+        """
+        evaluation = meta.get("evaluation") if isinstance(meta, dict) else None
+        if not evaluation:
+            raise ValueError("Result has no evaluation to export")
+        if roster_id is None:
+            roster_id = meta.get("query_key") or str(self.rosters)
+        rows, _ = backend.RankEvaluation(evaluation, meta.get("weights"))
+        self._pending.append(_roster_columns(rows, evaluation, str(roster_id), self.paths))
+        self.rosters += 1
+        if len(self._pending) >= self.chunk_rosters:
+            self.flush()
+
+    def flush(self):
+        """Write buffered rosters as a new chunk. Returns its path, or None if nothing was buffered."""
+        if not self._pending:
+            return None
+        path = os.path.join(self.directory, f"part-{self.chunks:05d}.npz")
+        np.savez(path, **_concat_chunk(self._pending))
+        self.chunks += 1
+        self.written += 1
+        self._pending = []
+        return path
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def ReadChunks(directory):
+    """Yield every chunk in `directory` as a dict of flat columns, in write order."""
+    for path in sorted(glob.glob(os.path.join(directory, "part-*.npz"))):
+        with np.load(path, allow_pickle=False) as data:
+            yield {name: data[name] for name in data.files}
+
+
+def ReadResults(directory):
+    """Yield one dict per exported roster.
+
+    Candidate columns are aligned with "codes" (evaluation order; "rank" is the
+    position in the ranking). "time", "co2", "distance", "availability",
+    "stops" and "paths" are (candidates x origins) arrays; a path is the
+    itinerary's airport codes joined by "-", or "" if there is none.
+    """
+    for chunk in ReadChunks(directory):
+        origin_offsets = chunk["origin_offsets"]
+        candidate_offsets = chunk["candidate_offsets"]
+        cell_offsets = chunk["cell_offsets"]
+        for position, roster_id in enumerate(chunk["roster"]):
+            origins = slice(origin_offsets[position], origin_offsets[position + 1])
+            candidates = slice(candidate_offsets[position], candidate_offsets[position + 1])
+            cells = slice(cell_offsets[position], cell_offsets[position + 1])
+            shape = (candidates.stop - candidates.start, origins.stop - origins.start)
+            result = {
+                "roster": str(roster_id),
+                "origins": chunk["origins"][origins],
+                "weights": chunk["weights"][origins],
+                "codes": chunk["codes"][candidates],
+                "rank": chunk["rank"][candidates],
+                "pareto": chunk["pareto"][candidates],
+            }
+            for name in _AGGREGATES:
+                result[name] = chunk[name][candidates]
+            for name in ("time", "co2", "distance", "availability", "stops"):
+                result[name] = chunk[name][cells].reshape(shape)
+            result["paths"] = chunk["path_values"][chunk["path_index"][cells]].reshape(shape)
+            yield result
+
+
+def LoadColumn(directory, name):
+    """One flat column concatenated across all chunks, e.g. every candidate's "score"."""
+    parts = []
+    for path in sorted(glob.glob(os.path.join(directory, "part-*.npz"))):
+        with np.load(path, allow_pickle=False) as data:
+            parts.append(data[name])
+    return np.concatenate(parts) if parts else np.array([])
@@ -0,0 +1,111 @@
+import numpy as np
+
+
+def _origin_weights(values, weights):
+    if weights is None:
+        return np.ones(values.shape[1])
+    return np.asarray(weights, dtype=float)
+
+
+def WeightedMean(values, weights=None):
+    """Row-wise mean of a (candidates x origins) matrix, weighting each origin column."""
+    values = np.asarray(values, dtype=float)
+    weights = _origin_weights(values, weights)
+    total = weights.sum()
+    if values.shape[1] == 0 or total <= 0:
+        return np.zeros(values.shape[0])
+    return (values @ weights) / total
+
+
+def WeightedVariance(values, weights=None):
+    values = np.asarray(values, dtype=float)
+    weights = _origin_weights(values, weights)
+    total = weights.sum()
+    if values.shape[1] == 0 or total <= 0:
+        return np.zeros(values.shape[0])
+    mean = (values @ weights) / total
+    return ((values - mean[:, None]) ** 2 @ weights) / total
+
+
+def WeightedPercentile(values, q, weights=None):
+    """Row-wise percentile treating each origin as `weight` attendees.
+
+    With integer headcounts this matches np.percentile over the expanded attendee list.
+    """
+    values = np.asarray(values, dtype=float)
+    rows, count = values.shape
+    if count == 0:
+        return np.zeros(rows)
+    weights = _origin_weights(values, weights)
+    order = np.argsort(values, axis=1)
+    ordered = np.take_along_axis(values, order, axis=1)
+    cumulative = np.cumsum(weights[order], axis=1)
+    total = cumulative[:, -1]
+    position = (q / 100.0) * np.maximum(total - 1.0, 0.0)
+    lower = np.floor(position)
+    fraction = position - lower
+    lower_index = np.minimum((cumulative <= lower[:, None]).sum(axis=1), count - 1)
+    upper_index = np.minimum((cumulative <= (lower + 1.0)[:, None]).sum(axis=1), count - 1)
+    row_index = np.arange(rows)
+    lower_value = ordered[row_index, lower_index]
+    upper_value = ordered[row_index, upper_index]
+    return lower_value + fraction * (upper_value - lower_value)
+
+
+def Gini(values, weights=None):
+    """Row-wise Gini coefficient of a (candidates x origins) matrix.
+
+    0 means every attendee carries the same burden; values approach 1 as the burden
+    concentrates on a single attendee.
+    """
+    values = np.asarray(values, dtype=float)
+    rows, count = values.shape
+    if count == 0:
+        return np.zeros(rows)
+    weights = _origin_weights(values, weights)
+    order = np.argsort(values, axis=1)
+    ordered = np.take_along_axis(values, order, axis=1)
+    ordered_weights = weights[order]
+    cumulative = np.cumsum(ordered_weights, axis=1)
+    total_weight = cumulative[:, -1:]
+    mass = ordered * ordered_weights
+    totals = mass.sum(axis=1)
+    spread = (mass * (2.0 * cumulative - ordered_weights - total_weight)).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gini = spread / (total_weight[:, 0] * totals)
+    return np.where(totals > 0, gini, 0.0)
+
+
+def FairnessStats(metrics):
+    """Per-attendee burden statistics for every candidate, computed in one pass.
+
+    Returns a dict of arrays, one value per candidate row of the metric matrix.
+    """
+    times = metrics["time"]
+    co2 = metrics["co2"]
+    weights = metrics.get("weights")
+    rows = times.shape[0]
+    if times.shape[1] == 0:
+        zeros = np.zeros(rows)
+        return {
+            "max_time": zeros,
+            "min_time": zeros,
+            "time_spread": zeros,
+            "time_std": zeros,
+            "p90_time": zeros,
+            "gini_time": zeros,
+            "max_co2": zeros,
+            "gini_co2": zeros,
+        }
+    max_time = times.max(axis=1)
+    min_time = times.min(axis=1)
+    return {
+        "max_time": max_time,
+        "min_time": min_time,
+        "time_spread": max_time - min_time,
+        "time_std": np.sqrt(WeightedVariance(times, weights)),
+        "p90_time": WeightedPercentile(times, 90, weights),
+        "gini_time": Gini(times, weights),
+        "max_co2": co2.max(axis=1),
+        "gini_co2": Gini(co2, weights),
+    }
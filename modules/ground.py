@@ -0,0 +1,70 @@
+import numpy as np
+
+from modules import emissions
+
+_EARTH_RADIUS_KM = 6371.0
+# Road/rail distance per great-circle km, average door-to-door speed and fixed
+# access/transfer overhead of a ground leg between two airports.
+DETOUR_FACTOR = 1.3
+SPEED_KMH = 90.0
+OVERHEAD_MINUTES = 45.0
+
+
+def GroundTime(distance):
+    """Minutes for a ground leg covering `distance` great-circle km.
+
+    Never less than the flight-time model for the same distance (40 minutes
+    plus 875 km/h), so the A* great-circle heuristic stays admissible.
+    """
+    if distance <= 1e-6:
+        return 0.0
+    return OVERHEAD_MINUTES + distance * DETOUR_FACTOR * 60.0 / SPEED_KMH
+
+
+def GroundEdges(airports, served, radius_km, neighbours):
+    """Ground links from every airport to nearby airports in `served`.
+
+    Each airport with coordinates is linked to its `neighbours` nearest
+    airports of `served` within `radius_km` great-circle km. Candidates come
+    from a latitude-sorted window (binary search) and are measured with one
+    vectorised haversine per airport, so all ~7k airports take well under a
+    second. Returns (source, target, distance km) tuples; links between two
+    served airports are returned in both directions.
+    """
+    if radius_km <= 0 or neighbours <= 0:
+        return []
+    targets = sorted(code for code in served if airports.get(code))
+    if not targets:
+        return []
+    target_lat = np.array([airports[code]["lat"] for code in targets], dtype=float)
+    order = np.argsort(target_lat)
+    target_codes = np.array(targets)[order]
+    target_lat = np.radians(target_lat[order])
+    target_lon = np.radians(np.array([airports[code]["lon"] for code in target_codes], dtype=float))
+    window = radius_km / _EARTH_RADIUS_KM
+
+    links = {}
+    for code, info in airports.items():
+        lat, lon = np.radians(float(info["lat"])), np.radians(float(info["lon"]))
+        low, high = np.searchsorted(target_lat, [lat - window, lat + window])
+        if low == high:
+            continue
+        lats, lons = target_lat[low:high], target_lon[low:high]
+        a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+        distance = 2 * _EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+        near = np.flatnonzero((distance <= radius_km) & (target_codes[low:high] != code))
+        for index in near[np.argsort(distance[near], kind="stable")][:neighbours]:
+            other = str(target_codes[low + index])
+            links[(code, other)] = float(distance[index])
+            if code in served:
+                links[(other, code)] = float(distance[index])
+    return [(source, target, distance) for (source, target), distance in links.items()]
+
+
+def GroundLeg(distance):
+    """Edge annotation (distance, time, co2) for a ground leg of `distance` km."""
+    return {
+        "distance": distance,
+        "time": GroundTime(distance),
+        "co2": emissions.GroundEmissions(distance * DETOUR_FACTOR),
+    }
@@ -0,0 +1,108 @@
+import json
+import os
+
+import numpy as np
+
+from modules import trees
+from modules.scoring import AVAILABILITY_CODES, STOP_AVAILABILITY
+
+# Offline origin x hub matrices of best bounded-hop itineraries, stored as .npy
+# files (loaded memory-mapped) plus a meta.json naming the rows and columns and
+# the settings they were built with.
+
+_ARRAYS = {
+    "time": np.float32,
+    "distance": np.float32,
+    "co2": np.float32,
+    "airlines": np.float32,
+    "stops": np.int8,
+    "availability": np.int8,
+}
+_STOP_CODES = np.array([AVAILABILITY_CODES[name] for name in STOP_AVAILABILITY], dtype=np.int8)
+UNREACHABLE = -1  # availability of cells with no itinerary within the stop limit
+
+
+def BuildHubMatrix(edges, hub_codes, max_stops, layover_minutes):
+    """Best itinerary from every airport in `edges` to each hub, one forward tree per airport.
+
+    Values are exactly what the online origin trees produce. Returns
+    {name: (airports x hubs) array} with NaN times and UNREACHABLE availability
+    where no itinerary exists.
+    """
+    hub_columns = np.array([edges["index"][code] for code in hub_codes], dtype=np.int64)
+    shape = (len(edges["codes"]), len(hub_codes))
+    matrix = {name: np.full(shape, np.nan, dtype=dtype) for name, dtype in _ARRAYS.items() if dtype == np.float32}
+    matrix["stops"] = np.zeros(shape, dtype=np.int8)
+    matrix["availability"] = np.full(shape, UNREACHABLE, dtype=np.int8)
+    for row, origin in enumerate(edges["codes"]):
+        tree = trees.BuildTree(edges, origin, max_stops, layover_minutes)
+        if tree is None:
+            continue
+        time = tree["time"][hub_columns]
+        legs = tree["legs"][hub_columns].astype(np.int64)
+        flown = np.isfinite(time) & (legs > 0)
+        same = hub_columns == tree["origin"]
+        matrix["time"][row] = np.where(flown | same, time, np.nan)
+        matrix["distance"][row] = np.where(flown | same, tree["distance"][hub_columns], np.nan)
+        matrix["co2"][row] = np.where(flown | same, tree["co2"][hub_columns], np.nan)
+        stops = np.clip(legs - 1, 0, len(_STOP_CODES) - 1)
+        airlines = np.round(tree["airline_sum"][hub_columns] / np.maximum(legs, 1), 3)
+        availability = np.where(tree["ground_only"][hub_columns], AVAILABILITY_CODES["ground"], _STOP_CODES[stops])
+        matrix["stops"][row] = np.where(flown, stops, 0)
+        matrix["airlines"][row] = np.where(flown, airlines, 0.0)
+        matrix["availability"][row] = np.where(
+            flown, availability, np.where(same, AVAILABILITY_CODES["same"], UNREACHABLE)
+        )
+    return matrix
+
+
+def SaveHubMatrix(directory, matrix, origin_codes, hub_codes, settings):
+    """Write the matrices and their meta.json into `directory`."""
+    os.makedirs(directory, exist_ok=True)
+    for name in _ARRAYS:
+        np.save(os.path.join(directory, f"{name}.npy"), matrix[name])
+    meta = {"origins": list(origin_codes), "hubs": list(hub_codes), "settings": settings}
+    with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as file:
+        json.dump(meta, file)
+
+
+def LoadHubMatrix(directory, settings):
+    """Memory-map a saved matrix, or None if it is missing or was built with other settings."""
+    try:
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as file:
+            meta = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if meta.get("settings") != settings:
+        print("Hub matrix is out of date; rebuild it with `python main.py --build-hub-matrix`.")
+        return None
+    try:
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in _ARRAYS}
+    except (OSError, ValueError):
+        return None
+    return {
+        "origins": {code: row for row, code in enumerate(meta["origins"])},
+        "hubs": {code: column for column, code in enumerate(meta["hubs"])},
+        **arrays,
+    }
+
+
+def GatherHubMatrix(hub_matrix, origin_codes, candidate_codes):
+    """(candidates x origins) arrays for the covered cells, and the covered mask.
+
+    A cell is covered when its candidate is a hub and its origin a row of the
+    matrix and an itinerary (or the same airport) exists; other cells are zero
+    and need a route search.
+    """
+    rows = np.array([hub_matrix["origins"].get(code, -1) for code in origin_codes], dtype=np.int64)
+    columns = np.array([hub_matrix["hubs"].get(code, -1) for code in candidate_codes], dtype=np.int64)
+    known = (columns[:, None] >= 0) & (rows[None, :] >= 0)
+    row_index = np.broadcast_to(np.maximum(rows, 0)[None, :], known.shape)
+    column_index = np.broadcast_to(np.maximum(columns, 0)[:, None], known.shape)
+    availability = np.asarray(hub_matrix["availability"])[row_index, column_index]
+    covered = known & (availability != UNREACHABLE)
+    gathered = {"availability": np.where(covered, availability, 0).astype(np.int8)}
+    for name in ("time", "distance", "co2", "airlines"):
+        gathered[name] = np.where(covered, np.asarray(hub_matrix[name])[row_index, column_index], 0.0).astype(float)
+    gathered["stops"] = np.where(covered, np.asarray(hub_matrix["stops"])[row_index, column_index], 0).astype(np.int8)
+    return gathered, covered
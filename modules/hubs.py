@@ -0,0 +1,62 @@
+import math
+
+# Weights of the hub quality components; each component is normalised to [0, 1].
+_QUALITY_WEIGHTS = {"degree": 0.35, "one_stop_reach": 0.45, "airline_diversity": 0.2}
+
+
+def BuildHubIndex(direct_routes, airports):
+    """Score how well connected every routed airport is.
+
+    Returns {code: {"degree", "one_stop_reach", "airline_diversity", "quality"}} where
+    `one_stop_reach` counts airports reachable with at most one connection and
+    `quality` combines the three log/linear-normalised components in [0, 1].
+    Reachability uses int bitsets, so the whole index builds in well under a second.
+    """
+    codes = sorted(code for code in direct_routes if code in airports)
+    bit = {code: index for index, code in enumerate(codes)}
+    adjacency = {}
+    for code in codes:
+        mask = 0
+        for dest in direct_routes[code]:
+            index = bit.get(dest)
+            if index is not None:
+                mask |= 1 << index
+        adjacency[code] = mask
+
+    raw = {}
+    for code in codes:
+        neighbours = direct_routes[code]
+        reach = adjacency[code]
+        for dest in neighbours:
+            reach |= adjacency.get(dest, 0)
+        reach &= ~(1 << bit[code])
+        airlines = set()
+        for info in neighbours.values():
+            airlines.update(info.get("airlines", ()))
+        raw[code] = (len(neighbours), bin(reach).count("1"), len(airlines))
+
+    if not raw:
+        return {}
+    max_degree = max(value[0] for value in raw.values()) or 1
+    max_reach = max(value[1] for value in raw.values()) or 1
+    max_airlines = max(value[2] for value in raw.values()) or 1
+
+    index = {}
+    for code, (degree, reach, airlines) in raw.items():
+        quality = (
+            _QUALITY_WEIGHTS["degree"] * math.log1p(degree) / math.log1p(max_degree)
+            + _QUALITY_WEIGHTS["one_stop_reach"] * reach / max_reach
+            + _QUALITY_WEIGHTS["airline_diversity"] * math.log1p(airlines) / math.log1p(max_airlines)
+        )
+        index[code] = {
+            "degree": degree,
+            "one_stop_reach": reach,
+            "airline_diversity": airlines,
+            "quality": quality,
+        }
+    return index
+
+
+def TopHubs(hub_index, count):
+    """The `count` highest quality airports, best first."""
+    return sorted(hub_index, key=lambda code: (-hub_index[code]["quality"], code))[:count]
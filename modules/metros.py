@@ -0,0 +1,77 @@
+import numpy as np
+
+_EARTH_RADIUS_KM = 6371.0
+
+
+def _distances_km(lat, lon, lats, lons):
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * _EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def BuildMetroAreas(airports, direct_routes, radius_km=60.0, city_radius_km=100.0, max_members=6):
+    """Group routed airports that serve the same metro area.
+
+    Airports sharing a city and country form a group around their busiest airport
+    (by number of routes) if they lie within `city_radius_km` of it. Groups whose
+    main airport is within `radius_km` of a busier group's main airport are merged
+    into it, so Newark joins New York.
+    Groups keep at most `max_members` airports, busiest first.
+
+    Returns {code: members} for every airport in a group of two or more; all
+    members map to the same tuple.
+    """
+    routed = [code for code in direct_routes if code in airports]
+    degree = {code: len(direct_routes[code]) for code in routed}
+
+    cities = {}
+    for code in routed:
+        info = airports[code]
+        city = (info.get("city") or "").strip().lower()
+        key = (info.get("country"), city) if city else (None, code)
+        cities.setdefault(key, []).append(code)
+
+    groups = []
+    for members in cities.values():
+        members.sort(key=lambda code: (-degree[code], code))
+        anchor = airports[members[0]]
+        lats = np.array([airports[code]["lat"] for code in members])
+        lons = np.array([airports[code]["lon"] for code in members])
+        # Same city name far away (another Portland) stays a separate group
+        near = _distances_km(anchor["lat"], anchor["lon"], lats, lons) <= city_radius_km
+        groups.append([code for code, keep in zip(members, near) if keep])
+        groups.extend([code] for code, keep in zip(members, near) if not keep)
+
+    groups.sort(key=lambda members: (-degree[members[0]], members[0]))
+    anchor_lats = np.array([airports[members[0]]["lat"] for members in groups])
+    anchor_lons = np.array([airports[members[0]]["lon"] for members in groups])
+    absorbed = np.zeros(len(groups), dtype=bool)
+    metros = {}
+    for position, members in enumerate(groups):
+        if absorbed[position]:
+            continue
+        anchor = airports[members[0]]
+        near = _distances_km(anchor["lat"], anchor["lon"], anchor_lats, anchor_lons) <= radius_km
+        near[: position + 1] = False
+        near &= ~absorbed
+        absorbed |= near
+        merged = list(members)
+        for other in np.flatnonzero(near):
+            merged.extend(groups[other])
+        if len(merged) < 2:
+            continue
+        merged.sort(key=lambda code: (-degree[code], code))
+        area = tuple(merged[:max_members])
+        for code in area:
+            metros[code] = area
+    return metros
+
+
+def OriginGroups(origins, metro_areas):
+    """Departure airports each (code, weight) origin may use, the requested airport first."""
+    groups = {}
+    for code, _ in origins:
+        members = metro_areas.get(code, ()) if metro_areas else ()
+        groups[code] = (code,) + tuple(member for member in members if member != code)
+    return groups
@@ -0,0 +1,150 @@
+import json
+import os
+import threading
+import time
+
+# Opt-in span recording for UI submissions, written as Chrome trace JSON
+# (open in chrome://tracing or https://ui.perfetto.dev).
+
+_TRACE_DIR = None
+_ACTIVE = threading.local()
+_COUNTER_LOCK = threading.Lock()
+_COUNTER = 0
+
+
+def Enable(directory):
+    """Record one trace file per submission into `directory`."""
+    global _TRACE_DIR
+    os.makedirs(directory, exist_ok=True)
+    _TRACE_DIR = directory
+
+
+def Enabled():
+    return _TRACE_DIR is not None
+
+
+class Trace:
+    """Spans recorded for one submission, possibly from several threads."""
+
+    def __init__(self, name, **args):
+        global _COUNTER
+        with _COUNTER_LOCK:
+            _COUNTER += 1
+            self.number = _COUNTER
+        self.name = name
+        self.args = args
+        self.start = time.perf_counter()
+        self.events = []
+        self.lock = threading.Lock()
+        self.finished = False
+
+    def _micros(self, moment):
+        return round((moment - self.start) * 1e6, 1)
+
+    def add(self, name, begin, end, **args):
+        event = {
+            "name": name,
+            "ph": "X",
+            "ts": self._micros(begin),
+            "dur": round((end - begin) * 1e6, 1),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": args,
+        }
+        with self.lock:
+            self.events.append(event)
+
+    def mark(self, name, **args):
+        """Record `name` as a span from the start of the submission until now."""
+        self.add(name, self.start, time.perf_counter(), **args)
+
+    def finish(self):
+        """Close the root span and write the trace file. Returns its path."""
+        with self.lock:
+            if self.finished:
+                return None
+            self.finished = True
+        end = time.perf_counter()
+        root = {
+            "name": self.name,
+            "ph": "X",
+            "ts": 0.0,
+            "dur": round((end - self.start) * 1e6, 1),
+            "pid": os.getpid(),
+            "tid": threading.main_thread().ident,
+            "args": self.args,
+        }
+        threads = {event["tid"] for event in self.events} | {root["tid"]}
+        names = [
+            {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid,
+             "args": {"name": "ui" if tid == threading.main_thread().ident else f"worker-{tid}"}}
+            for tid in sorted(threads)
+        ]
+        path = os.path.join(_TRACE_DIR or ".", f"trace-{time.strftime('%Y%m%d-%H%M%S')}-{self.number}.json")
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({"traceEvents": names + [root] + self.events, "displayTimeUnit": "ms"}, file)
+        return path
+
+
+class _SpanTimer:
+    __slots__ = ("trace", "name", "args", "begin")
+
+    def __init__(self, trace, name, args):
+        self.trace = trace
+        self.name = name
+        self.args = args
+        self.begin = 0.0
+
+    def __enter__(self):
+        self.begin = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.add(self.name, self.begin, time.perf_counter(), **self.args)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def StartTrace(name, **args):
+    """A new Trace when profiling is enabled, else None."""
+    return Trace(name, **args) if _TRACE_DIR is not None else None
+
+
+def Span(name, trace=None, **args):
+    """Context manager timing `name` in `trace` (default: the thread's active trace)."""
+    trace = trace if trace is not None else getattr(_ACTIVE, "trace", None)
+    if trace is None:
+        return _NO_SPAN
+    return _SpanTimer(trace, name, args)
+
+
+class _Activation:
+    def __init__(self, trace):
+        self.trace = trace
+        self.previous = None
+
+    def __enter__(self):
+        self.previous = getattr(_ACTIVE, "trace", None)
+        _ACTIVE.trace = self.trace
+        return self.trace
+
+    def __exit__(self, *exc):
+        _ACTIVE.trace = self.previous
+        return False
+
+
+def Activate(trace):
+    """Context manager making `trace` this thread's active trace, so nested Span() calls record into it."""
+    return _Activation(trace)
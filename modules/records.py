@@ -0,0 +1,145 @@
+class SearchLabel:
+    """One partial itinerary in the route search, linked to its parent label.
+
+    The path is never copied: it is rebuilt by walking `parent` pointers once a
+    destination label is accepted.
+    """
+
+    __slots__ = (
+        "airport",
+        "parent",
+        "legs",
+        "time",
+        "distance",
+        "co2",
+        "layovers",
+        "leg_distance",
+        "leg_time",
+        "leg_airlines",
+        "carriers",
+    )
+
+    def __init__(self, airport, parent, legs, time, distance, co2, layovers,
+                 leg_distance=0.0, leg_time=0.0, leg_airlines=0, carriers=-1):
+        self.airport = airport
+        self.parent = parent
+        self.legs = legs
+        self.time = time
+        self.distance = distance
+        self.co2 = co2
+        self.layovers = layovers
+        self.leg_distance = leg_distance
+        self.leg_time = leg_time
+        self.leg_airlines = leg_airlines
+        self.carriers = carriers
+
+    def visits(self, airport):
+        label = self
+        while label is not None:
+            if label.airport == airport:
+                return True
+            label = label.parent
+        return False
+
+    def chain(self):
+        """Labels from the origin to this one."""
+        labels = []
+        label = self
+        while label is not None:
+            labels.append(label)
+            label = label.parent
+        labels.reverse()
+        return labels
+
+
+class RouteSegment:
+    __slots__ = ("origin", "dest", "distance", "time", "airlines")
+
+    def __init__(self, origin, dest, distance, time, airlines):
+        self.origin = origin
+        self.dest = dest
+        self.distance = distance
+        self.time = time
+        self.airlines = airlines
+
+    def to_dict(self):
+        return {
+            "from": self.origin,
+            "to": self.dest,
+            "distance": self.distance,
+            "time": self.time,
+            "airlines": self.airlines,
+        }
+
+
+class RouteDetail:
+    """Best itinerary between two airports. Use to_dict() at the UI/AI boundary."""
+
+    __slots__ = (
+        "availability",
+        "legs",
+        "stops",
+        "path",
+        "segments",
+        "distance",
+        "time",
+        "co2",
+        "airlines",
+        "layover_minutes",
+        "penalty_minutes",
+    )
+
+    def __init__(self, availability, legs, stops, path, segments, distance, time, co2, airlines,
+                 layover_minutes=None, penalty_minutes=None):
+        self.availability = availability
+        self.legs = legs
+        self.stops = stops
+        self.path = path
+        self.segments = segments
+        self.distance = distance
+        self.time = time
+        self.co2 = co2
+        self.airlines = airlines
+        self.layover_minutes = layover_minutes
+        self.penalty_minutes = penalty_minutes
+
+    @classmethod
+    def from_label(cls, label, availability):
+        labels = label.chain()
+        segments = tuple(
+            RouteSegment(prev.airport, nxt.airport, nxt.leg_distance, nxt.leg_time, nxt.leg_airlines)
+            for prev, nxt in zip(labels, labels[1:])
+        )
+        avg_airlines = 0.0
+        if segments:
+            avg_airlines = sum(segment.airlines for segment in segments) / len(segments)
+        return cls(
+            availability,
+            len(segments),
+            len(labels) - 2,
+            tuple(item.airport for item in labels),
+            segments,
+            label.distance,
+            label.time,
+            label.co2,
+            round(avg_airlines, 3),
+            layover_minutes=label.layovers,
+        )
+
+    def to_dict(self):
+        detail = {
+            "availability": self.availability,
+            "legs": self.legs,
+            "stops": self.stops,
+            "path": list(self.path),
+            "segments": [segment.to_dict() for segment in self.segments],
+            "distance": self.distance,
+            "time": self.time,
+            "co2": self.co2,
+            "airlines": self.airlines,
+        }
+        if self.layover_minutes is not None:
+            detail["layover_minutes"] = self.layover_minutes
+        if self.penalty_minutes is not None:
+            detail["penalty_minutes"] = self.penalty_minutes
+        return detail
@@ -0,0 +1,246 @@
+import csv
+import os
+
+import numpy as np
+
+WEEK_MINUTES = 7 * 24 * 60
+_DEFAULT_MIN_CONNECTION_MINUTES = 45.0
+_DEFAULT_SEARCH_WINDOW_MINUTES = 48 * 60.0
+_DAY_NAMES = ("MON", "TUE", "WED", "THU", "FRI", "SAT", "SUN")
+
+
+def _parse_clock(value):
+    # "HH:MM" with an optional "+N" day offset, e.g. "07:05+1"
+    value = (value or "").strip()
+    clock, _, offset = value.partition("+")
+    hours, _, minutes = clock.partition(":")
+    return int(offset or 0) * 24 * 60 + int(hours) * 60 + int(minutes or 0)
+
+
+def ParseWeekTime(value):
+    """Parse "Tue 09:00" or "Tue 09:00 UTC" into minutes since Monday 00:00 UTC."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip()
+    if text.upper().endswith("UTC"):
+        text = text[:-3].rstrip()
+    day, _, clock = text.partition(" ")
+    day = day[:3].upper()
+    if day not in _DAY_NAMES:
+        raise ValueError(f"Unknown weekday in time: {value}")
+    return float(_DAY_NAMES.index(day) * 24 * 60 + _parse_clock(clock))
+
+
+def FormatWeekTime(minutes):
+    minutes = int(round(minutes)) % WEEK_MINUTES
+    day, rest = divmod(minutes, 24 * 60)
+    return f"{_DAY_NAMES[day].title()} {rest // 60:02d}:{rest % 60:02d}"
+
+
+def LoadConnectionTimes(path):
+    """Load per-airport minimum connection times as {IATA: minutes}.
+
+    Each CSV line is: IATA code, minutes. Returns an empty dict if the file
+    does not exist; airports it does not list keep the 45-minute default.
+    """
+    if not os.path.exists(path):
+        return {}
+    times = {}
+    with open(path, "r", encoding="utf-8") as file:
+        for parts in csv.reader(file):
+            if len(parts) < 2 or parts[0].startswith("#"):
+                continue
+            code = (parts[0] or "").strip().upper()
+            try:
+                minutes = float(parts[1])
+            except ValueError:
+                continue
+            if len(code) == 3 and minutes >= 0:
+                times[code] = minutes
+    return times
+
+
+def LoadTimetable(path, min_connection_minutes=None):
+    """Load a weekly timetable into a connection-scan structure.
+
+    Each CSV line is: airline, flight number, source IATA, destination IATA,
+    departure "HH:MM", arrival "HH:MM[+days]", operating days ("1234567", Monday = 1).
+    Times are UTC. The week is repeated twice so journeys may wrap past Sunday.
+    `min_connection_minutes` maps IATA codes to their minimum connection time
+    (see LoadConnectionTimes); other airports get 45 minutes.
+
+    Returns a dict of connection arrays sorted by departure time, or None if the
+    file does not exist.
+    """
+    if not os.path.exists(path):
+        return None
+
+    stops = {}
+    rows = []
+    with open(path, "r", encoding="utf-8") as file:
+        reader = csv.reader(file)
+        for parts in reader:
+            if len(parts) < 7 or parts[0].startswith("#"):
+                continue
+            src = (parts[2] or "").strip().upper()
+            dest = (parts[3] or "").strip().upper()
+            if len(src) != 3 or len(dest) != 3 or src == dest:
+                continue
+            try:
+                departure = _parse_clock(parts[4])
+                arrival = _parse_clock(parts[5])
+            except ValueError:
+                continue
+            if arrival <= departure:
+                arrival += 24 * 60
+            days = [int(ch) for ch in (parts[6] or "").strip() if ch in "1234567"]
+            src_index = stops.setdefault(src, len(stops))
+            dest_index = stops.setdefault(dest, len(stops))
+            label = f"{(parts[0] or '').strip().upper()}{(parts[1] or '').strip()}"
+            for day in days:
+                for week in (0, 1):
+                    offset = week * WEEK_MINUTES + (day - 1) * 24 * 60
+                    rows.append((offset + departure, offset + arrival, src_index, dest_index, label))
+
+    rows.sort(key=lambda row: (row[0], row[1]))
+    codes = [None] * len(stops)
+    for code, index in stops.items():
+        codes[index] = code
+    min_connection = np.full(len(codes), _DEFAULT_MIN_CONNECTION_MINUTES)
+    for code, minutes in (min_connection_minutes or {}).items():
+        if code in stops:
+            min_connection[stops[code]] = float(minutes)
+
+    return {
+        "codes": codes,
+        "index": stops,
+        "departure": np.array([row[0] for row in rows], dtype=float),
+        "arrival": np.array([row[1] for row in rows], dtype=float),
+        "from": np.array([row[2] for row in rows], dtype=np.int32),
+        "to": np.array([row[3] for row in rows], dtype=np.int32),
+        "flights": [row[4] for row in rows],
+        "min_connection": min_connection,
+    }
+
+
+def EarliestArrival(timetable, origin, depart_after, arrive_by=None):
+    """Connection scan from `origin` leaving no earlier than `depart_after`.
+
+    Connections are only taken if the traveller reaches the departure airport at
+    least the minimum connection time beforehand. Returns a dict with per-stop
+    arrays: arrival, first departure, stops and the last connection used (-1 if none).
+    """
+    count = len(timetable["codes"])
+    arrival = [float("inf")] * count
+    first_departure = [float("inf")] * count
+    legs = [0] * count
+    last_connection = [-1] * count
+
+    origin_index = timetable["index"].get(origin)
+    if origin_index is not None:
+        arrival[origin_index] = float(depart_after)
+        first_departure[origin_index] = float(depart_after)
+
+        departures = timetable["departure"]
+        start = int(np.searchsorted(departures, depart_after, side="left"))
+        end = len(departures)
+        if arrive_by is not None:
+            end = int(np.searchsorted(departures, arrive_by, side="right"))
+        dep_list = departures[start:end].tolist()
+        arr_list = timetable["arrival"][start:end].tolist()
+        from_list = timetable["from"][start:end].tolist()
+        to_list = timetable["to"][start:end].tolist()
+        min_connection = timetable["min_connection"].tolist()
+
+        for offset, dep in enumerate(dep_list):
+            src = from_list[offset]
+            reached = arrival[src]
+            if reached == float("inf"):
+                continue
+            if src != origin_index and reached + min_connection[src] > dep:
+                continue
+            arr = arr_list[offset]
+            dest = to_list[offset]
+            if arr < arrival[dest]:
+                arrival[dest] = arr
+                first_departure[dest] = dep if src == origin_index else first_departure[src]
+                legs[dest] = legs[src] + 1
+                last_connection[dest] = start + offset
+
+    return {
+        "arrival": np.array(arrival),
+        "first_departure": np.array(first_departure),
+        "legs": np.array(legs, dtype=np.int16),
+        "last_connection": np.array(last_connection, dtype=np.int64),
+    }
+
+
+def JourneyPath(timetable, scan, origin, dest):
+    """Rebuild the airport sequence and flight labels of a scanned journey."""
+    index = timetable["index"]
+    if dest not in index or origin not in index:
+        return [], []
+    path = [dest]
+    flights = []
+    current = index[dest]
+    origin_index = index[origin]
+    last_connection = scan["last_connection"]
+    while current != origin_index:
+        connection = int(last_connection[current])
+        if connection < 0:
+            return [], []
+        flights.append(timetable["flights"][connection])
+        current = int(timetable["from"][connection])
+        path.append(timetable["codes"][current])
+    path.reverse()
+    flights.reverse()
+    return path, flights
+
+
+def DeadlineMatrix(timetable, origins, candidates, arrive_by, depart_after=None):
+    """Scheduled journeys from every origin to every candidate arriving by `arrive_by`.
+
+    Runs one connection scan per origin, so the cost does not grow with the
+    number of candidates. Returns (candidates x origins) arrays of journey
+    minutes, arrival time, stops and an on-time flag, plus the raw scans.
+    """
+    arrive_by = ParseWeekTime(arrive_by)
+    if depart_after is None:
+        depart_after = arrive_by - _DEFAULT_SEARCH_WINDOW_MINUTES
+    else:
+        depart_after = ParseWeekTime(depart_after)
+    if depart_after > arrive_by:
+        depart_after -= WEEK_MINUTES
+    if depart_after < 0:
+        depart_after += WEEK_MINUTES
+        arrive_by += WEEK_MINUTES
+
+    shape = (len(candidates), len(origins))
+    journey = np.full(shape, np.inf)
+    arrival = np.full(shape, np.inf)
+    stops = np.zeros(shape, dtype=np.int16)
+    candidate_index = np.array([timetable["index"].get(code, -1) for code in candidates], dtype=np.int64)
+    known = candidate_index >= 0
+    scans = {}
+    for col, origin in enumerate(origins):
+        scan = EarliestArrival(timetable, origin, depart_after, arrive_by)
+        scans[origin] = scan
+        rows = candidate_index[known]
+        arrival[known, col] = scan["arrival"][rows]
+        with np.errstate(invalid="ignore"):
+            journey[known, col] = scan["arrival"][rows] - scan["first_departure"][rows]
+        stops[known, col] = np.maximum(scan["legs"][rows] - 1, 0)
+        origin_rows = np.array([code == origin for code in candidates])
+        arrival[origin_rows, col] = depart_after
+        journey[origin_rows, col] = 0.0
+        stops[origin_rows, col] = 0
+
+    return {
+        "journey": journey,
+        "arrival": arrival,
+        "stops": stops,
+        "on_time": arrival <= arrive_by,
+        "arrive_by": arrive_by,
+        "depart_after": depart_after,
+        "scans": scans,
+    }
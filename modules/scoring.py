@@ -0,0 +1,207 @@
+import numpy as np
+
+from modules import fairness
+
+# Availability codes used in the candidate x origin metric matrix.
+AVAILABILITY_CODES = {
+    "same": 0,
+    "direct": 1,
+    "one_stop": 2,
+    "two_stop": 3,
+    "fallback": 4,
+    "three_stop": 5,
+    "four_stop": 6,
+    "ground": 7,
+}
+AVAILABILITY_NAMES = {code: name for name, code in AVAILABILITY_CODES.items()}
+# Availability class of a flown itinerary by its number of connections
+# (itineraries made only of ground legs are "ground").
+STOP_AVAILABILITY = ("direct", "one_stop", "two_stop", "three_stop", "four_stop")
+
+# Score penalty applied per origin fraction for each availability class.
+_CONNECTIVITY_PENALTIES = np.array([0.0, 0.0, 0.04, 0.08, 0.16, 0.11, 0.13, 0.0])
+
+
+def _row_mean(values, metrics):
+    return fairness.WeightedMean(values, metrics.get("weights"))
+
+
+def _mean_distance(metrics):
+    return _row_mean(metrics["distance"], metrics)
+
+
+def _connectivity(metrics):
+    return _row_mean(_CONNECTIVITY_PENALTIES[metrics["availability"]], metrics)
+
+
+def _mean_time(metrics):
+    return _row_mean(metrics["time"], metrics)
+
+
+def _max_time(metrics):
+    times = metrics["time"]
+    if times.shape[1] == 0:
+        return np.zeros(times.shape[0])
+    return times.max(axis=1)
+
+
+def _time_variance(metrics):
+    return fairness.WeightedVariance(metrics["time"], metrics.get("weights"))
+
+
+def _p90_time(metrics):
+    return fairness.WeightedPercentile(metrics["time"], 90, metrics.get("weights"))
+
+
+def _time_spread(metrics):
+    times = metrics["time"]
+    if times.shape[1] == 0:
+        return np.zeros(times.shape[0])
+    return times.max(axis=1) - times.min(axis=1)
+
+
+def _gini_time(metrics):
+    return fairness.Gini(metrics["time"], metrics.get("weights"))
+
+
+def _gini_co2(metrics):
+    return fairness.Gini(metrics["co2"], metrics.get("weights"))
+
+
+def _total_co2(metrics):
+    weights = metrics.get("weights")
+    if weights is None:
+        return metrics["co2"].sum(axis=1)
+    return metrics["co2"] @ weights
+
+
+def _stops(metrics):
+    return _row_mean(metrics["stops"].astype(float), metrics)
+
+
+def _late_arrivals(metrics):
+    late = metrics.get("late")
+    if late is None:
+        return np.zeros(len(metrics["codes"]))
+    return _row_mean(late, metrics)
+
+
+# name -> (function(metrics) -> per-candidate values, scale)
+# A candidate's score is 1 - sum(weight * value / scale), clipped to [0, 1].
+OBJECTIVES = {
+    "mean_distance": (_mean_distance, 15000.0),
+    "connectivity": (_connectivity, 1.0),
+    "mean_time": (_mean_time, 1440.0),
+    "max_time": (_max_time, 1440.0),
+    "time_variance": (_time_variance, 720.0 ** 2),
+    "p90_time": (_p90_time, 1440.0),
+    "time_spread": (_time_spread, 1440.0),
+    "gini_time": (_gini_time, 1.0),
+    "gini_co2": (_gini_co2, 1.0),
+    "total_co2": (_total_co2, None),
+    "stops": (_stops, 2.0),
+    "late_arrivals": (_late_arrivals, 1.0),
+}
+
+# Objectives whose raw value grows with the number of origins are scaled per origin.
+_PER_ORIGIN_SCALES = {
+    "total_co2": 1000.0,
+}
+
+DEFAULT_WEIGHTS = {"mean_distance": 1.0, "connectivity": 1.0}
+
+PRESETS = {
+    "Balanced": DEFAULT_WEIGHTS,
+    "Fastest": {"mean_time": 1.0, "connectivity": 0.5},
+    "Fairest": {"max_time": 1.0, "gini_time": 0.5, "connectivity": 0.5},
+    "Greenest": {"total_co2": 1.0, "connectivity": 0.5},
+    "Fewest stops": {"stops": 1.0, "mean_time": 0.25},
+}
+
+# Objectives that never decrease when any cell's time, distance, CO2, stops or
+# connectivity penalty grows; scores from lower-bound metrics then bound the
+# true scores from above. Spread and inequality measures are not monotone.
+MONOTONE_OBJECTIVES = frozenset(
+    {"mean_distance", "connectivity", "mean_time", "max_time", "p90_time", "total_co2", "stops", "late_arrivals"}
+)
+
+PARETO_OBJECTIVES = ("mean_time", "max_time", "total_co2", "stops")
+
+
+def RegisterObjective(name, func, scale=1.0):
+    OBJECTIVES[name] = (func, float(scale))
+
+
+def ObjectiveValues(metrics, names):
+    """Return a (candidates x objectives) matrix of raw objective values."""
+    count = len(metrics["codes"])
+    if not names:
+        return np.zeros((count, 0))
+    columns = []
+    for name in names:
+        if name not in OBJECTIVES:
+            raise KeyError(f"Unknown scoring objective: {name}")
+        func, _ = OBJECTIVES[name]
+        columns.append(np.asarray(func(metrics), dtype=float))
+    return np.column_stack(columns)
+
+
+def _objective_scale(name, metrics):
+    _, scale = OBJECTIVES[name]
+    if scale is None:
+        weights = metrics.get("weights")
+        attendees = metrics["time"].shape[1] if weights is None else float(np.sum(weights))
+        scale = _PER_ORIGIN_SCALES.get(name, 1.0) * max(1.0, attendees)
+    return scale
+
+
+def ScoreCandidates(metrics, weights=None):
+    """Return (scores, penalty) arrays for every candidate in the metric matrix."""
+    weights = DEFAULT_WEIGHTS if weights is None else weights
+    names = [name for name, weight in weights.items() if weight]
+    values = ObjectiveValues(metrics, names)
+    if not names:
+        cost = np.zeros(len(metrics["codes"]))
+    else:
+        scales = np.array([_objective_scale(name, metrics) for name in names])
+        factors = np.array([float(weights[name]) for name in names]) / scales
+        cost = values @ factors
+    penalty = np.zeros(len(metrics["codes"]))
+    if "connectivity" in names:
+        penalty = values[:, names.index("connectivity")] * float(weights["connectivity"])
+    scores = np.clip(1.0 - cost, 0.0, 1.0)
+    return scores, penalty
+
+
+def ParetoRanks(values):
+    """Non-dominated sorting of a (candidates x objectives) matrix, lower is better.
+
+    Returns 1-based ranks; rank 1 is the Pareto frontier.
+    """
+    values = np.asarray(values, dtype=float)
+    count = values.shape[0]
+    ranks = np.zeros(count, dtype=int)
+    if count == 0:
+        return ranks
+    if values.shape[1] == 0:
+        ranks[:] = 1
+        return ranks
+
+    no_worse = (values[:, None, :] <= values[None, :, :]).all(axis=2)
+    better = (values[:, None, :] < values[None, :, :]).any(axis=2)
+    # dominates[i, j]: candidate i dominates candidate j
+    dominates = no_worse & better
+    remaining = np.ones(count, dtype=bool)
+    rank = 1
+    while remaining.any():
+        dominated = (dominates & remaining[:, None]).any(axis=0)
+        layer = remaining & ~dominated
+        ranks[layer] = rank
+        remaining &= ~layer
+        rank += 1
+    return ranks
+
+
+def RankOrder(scores, total_distance, mean_time):
+    """Row order used for the results table: score desc, then distance, then time."""
+    return np.lexsort((np.round(mean_time, 3), np.round(total_distance, 3), -np.round(scores, 3)))
@@ -0,0 +1,127 @@
+import numpy as np
+
+from modules import emissions
+from modules.scoring import AVAILABILITY_CODES
+
+# Score surface over every airport: a lower bound of the metric matrix for all
+# candidates at once, and a grid of map cells to draw it with.
+
+_EARTH_RADIUS_KM = 6371.0
+_CRUISE_KMH = 875.0
+_TAXI_MINUTES = 40.0
+
+
+def _distances_km(lat, lon, origin_lat, origin_lon):
+    # (candidates x origins) haversine distances, all inputs in degrees
+    lat, lon = np.radians(lat)[:, None], np.radians(lon)[:, None]
+    origin_lat, origin_lon = np.radians(origin_lat)[None, :], np.radians(origin_lon)[None, :]
+    a = np.sin((origin_lat - lat) / 2) ** 2 + np.cos(lat) * np.cos(origin_lat) * np.sin((origin_lon - lon) / 2) ** 2
+    return 2 * _EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _leg_co2(distance):
+    # emissions.LegEmissions for the default aircraft category, element-wise
+    cruise, lto = emissions.CATEGORY_FACTORS[emissions.DEFAULT_CATEGORY]
+    uppers = np.array([upper for upper, _ in emissions.DISTANCE_BANDS])
+    multipliers = np.array([multiplier for _, multiplier in emissions.DISTANCE_BANDS] + [1.0])
+    band = multipliers[np.searchsorted(uppers, distance, side="right")]
+    return np.where(distance > 1e-6, lto + distance * cruise * band / 1000.0, 0.0)
+
+
+def _min_co2_per_km():
+    # Lowest kg CO2 per great-circle km of any leg: the cleanest aircraft
+    # category in its most efficient distance band, or a ground leg
+    cruise = min(factor for factor, _ in emissions.CATEGORY_FACTORS.values())
+    band = min(multiplier for _, multiplier in emissions.DISTANCE_BANDS)
+    return min(cruise * band, emissions.GROUND_FACTOR) / 1000.0
+
+
+def EstimateMetrics(origins, candidate_codes, airports, direct_routes, inbound_routes, layover_minutes,
+                    fallback_penalty):
+    """Lower-bound (candidates x origins) metric matrix from great circles and direct routes.
+
+    Every cell is at most the searched itinerary's time, distance, CO2,
+    stops and connectivity penalty:
+    - time is one flight along the great circle (ground legs are never
+      faster), plus a second leg's taxi time and `layover_minutes` (or the
+      fallback penalty, if smaller) when the origin has no direct route to
+      the candidate;
+    - distance is the great circle;
+    - CO2 is the great circle at the lowest factor of any aircraft or ground
+      leg, without take-off and landing overhead;
+    - stops are zero and connectivity penalties those of a direct route,
+      since a connection made only of ground legs has no penalty and a
+      restricted search may end in the stop-free fallback route.
+    Candidates nothing flies or drives to are priced exactly like the
+    engine's fallback route, `fallback_penalty` minutes included. Returns a
+    dict shaped like the route-aware metric matrix (without airline counts)
+    plus the candidates' "lat" and "lon".
+    """
+    codes = list(candidate_codes)
+    lat = np.array([float(airports[code]["lat"]) for code in codes])
+    lon = np.array([float(airports[code]["lon"]) for code in codes])
+    origin_codes = [code for code, _ in origins]
+    origin_lat = np.array([float(airports[code]["lat"]) for code in origin_codes])
+    origin_lon = np.array([float(airports[code]["lon"]) for code in origin_codes])
+
+    distance = _distances_km(lat, lon, origin_lat, origin_lon)
+    same = np.array(codes)[:, None] == np.array(origin_codes)[None, :]
+    nonstop = np.column_stack([
+        np.fromiter((code in direct_routes.get(origin, ()) for code in codes), dtype=bool, count=len(codes))
+        for origin in origin_codes
+    ])
+    unserved = ~np.fromiter((bool(inbound_routes.get(code)) for code in codes), dtype=bool, count=len(codes))
+    unserved = unserved[:, None] & ~same
+    connecting = ~same & ~nonstop & ~unserved
+
+    flown = _TAXI_MINUTES + distance * 60.0 / _CRUISE_KMH
+    time = np.where(connecting, flown + min(_TAXI_MINUTES + layover_minutes, fallback_penalty), flown)
+    time = np.where(unserved, flown + fallback_penalty, time)
+    co2 = np.where(unserved, _leg_co2(distance), distance * _min_co2_per_km())
+    availability = np.select(
+        [same, unserved],
+        [AVAILABILITY_CODES["same"], AVAILABILITY_CODES["fallback"]],
+        AVAILABILITY_CODES["direct"],
+    )
+    return {
+        "codes": codes,
+        "origins": origin_codes,
+        "weights": np.array([weight for _, weight in origins], dtype=float),
+        "lat": lat,
+        "lon": lon,
+        "time": np.where(same, 0.0, time),
+        "distance": np.where(same, 0.0, distance),
+        "co2": np.where(same, 0.0, co2),
+        "stops": np.zeros(distance.shape, dtype=np.int8),
+        "availability": availability.astype(np.int8),
+    }
+
+
+def SurfaceCells(lat, lon, scores, degrees):
+    """Best score per `degrees` x `degrees` map cell, best cells first.
+
+    Returns (south, west, north, east, score, index) tuples, where `index` is
+    the position of the cell's best airport in the input arrays.
+    """
+    if not len(scores):
+        return []
+    row = np.floor((np.asarray(lat) + 90.0) / degrees).astype(np.int64)
+    column = np.floor((np.asarray(lon) + 180.0) / degrees).astype(np.int64)
+    cell = row * int(np.ceil(360.0 / degrees) + 1) + column
+    # Sort by cell, best score first, and keep the first airport of each cell
+    order = np.lexsort((-np.asarray(scores), cell))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = cell[order][1:] != cell[order][:-1]
+    best = order[first]
+    best = best[np.argsort(-np.asarray(scores)[best], kind="stable")]
+    return [
+        (
+            row[index] * degrees - 90.0,
+            column[index] * degrees - 180.0,
+            min(90.0, (row[index] + 1) * degrees - 90.0),
+            min(180.0, (column[index] + 1) * degrees - 180.0),
+            float(scores[index]),
+            int(index),
+        )
+        for index in best
+    ]
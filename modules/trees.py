@@ -0,0 +1,234 @@
+import numpy as np
+
+from modules.records import RouteDetail, RouteSegment
+from modules.scoring import STOP_AVAILABILITY
+
+
+def EdgeArrays(direct_routes, carrier_mask=None):
+    """Flatten annotated direct routes into numpy edge arrays.
+
+    Edges without a distance (airport without coordinates) are dropped. With
+    `carrier_mask` only edges flown by one of the allowed carriers are kept and
+    each edge's airline count is restricted to those carriers; ground legs are
+    kept whatever the mask and have no airlines.
+    """
+    codes = set(direct_routes)
+    for neighbours in direct_routes.values():
+        codes.update(neighbours)
+    codes = sorted(codes)
+    index = {code: position for position, code in enumerate(codes)}
+
+    src, dst, time, distance, co2, airlines, by_ground = [], [], [], [], [], [], []
+    for code, neighbours in direct_routes.items():
+        code_index = index[code]
+        for other, info in neighbours.items():
+            if info.get("distance") is None:
+                continue
+            is_ground = info.get("mode") == "ground"
+            if is_ground:
+                count = 0
+            elif carrier_mask is not None:
+                allowed = info["mask"] & carrier_mask
+                if not allowed:
+                    continue
+                count = bin(allowed).count("1")
+            else:
+                count = len(info.get("airlines", ()))
+            src.append(code_index)
+            dst.append(index[other])
+            time.append(info["time"])
+            distance.append(info["distance"])
+            co2.append(info["co2"])
+            airlines.append(count)
+            by_ground.append(is_ground)
+
+    return {
+        "codes": codes,
+        "index": index,
+        "src": np.array(src, dtype=np.int32),
+        "dst": np.array(dst, dtype=np.int32),
+        "time": np.array(time, dtype=float),
+        "distance": np.array(distance, dtype=float),
+        "co2": np.array(co2, dtype=float),
+        "airlines": np.array(airlines, dtype=np.int16),
+        "ground": np.array(by_ground, dtype=bool),
+    }
+
+
+def BuildTree(edges, origin, max_stops, layover_minutes, reverse=False):
+    """Fastest itinerary from `origin` to every airport with at most `max_stops` connections.
+
+    Hop-bounded Bellman-Ford: round k relaxes every edge from the round k-1
+    labels at once, so each round is a handful of numpy operations. Ties on
+    time prefer the shorter distance, then the lower CO2, like the route search.
+    With `reverse` the edges are followed backwards, giving the fastest
+    itinerary from every airport *to* `origin`.
+
+    Returns compact per-airport arrays (time, distance, co2, legs, the summed
+    airline counts of the legs and whether every leg is a ground leg) plus the
+    edge used to enter each airport in every round, or None if `origin` has no
+    routes.
+    """
+    origin_index = edges["index"].get(origin)
+    if origin_index is None:
+        return None
+    count = len(edges["codes"])
+    rounds = max_stops + 1
+    time = np.full(count, np.inf)
+    distance = np.full(count, np.inf)
+    co2 = np.full(count, np.inf)
+    legs = np.zeros(count, dtype=np.int8)
+    airline_sum = np.zeros(count, dtype=np.int32)
+    ground_only = np.ones(count, dtype=bool)
+    time[origin_index] = distance[origin_index] = co2[origin_index] = 0.0
+    entry = np.full((rounds, count), -1, dtype=np.int32)
+
+    src, dst = (edges["dst"], edges["src"]) if reverse else (edges["src"], edges["dst"])
+    for round_index in range(rounds):
+        live = np.flatnonzero(np.isfinite(time[src]) & (dst != origin_index))
+        if not len(live):
+            break
+        from_index = src[live]
+        layover = np.where(from_index == origin_index, 0.0, layover_minutes)
+        cand_time = time[from_index] + layover + edges["time"][live]
+        cand_distance = distance[from_index] + edges["distance"][live]
+        cand_co2 = co2[from_index] + edges["co2"][live]
+        to_index = dst[live]
+
+        # Best candidate per destination: sort by (airport, time, distance, co2)
+        order = np.lexsort((cand_co2, cand_distance, cand_time, to_index))
+        sorted_to = to_index[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = sorted_to[1:] != sorted_to[:-1]
+        best = order[first]
+        targets = to_index[best]
+
+        improved = (cand_time[best] < time[targets] - 1e-6) | (
+            (np.abs(cand_time[best] - time[targets]) <= 1e-6) & (cand_distance[best] < distance[targets] - 1e-6)
+        )
+        best = best[improved]
+        targets = targets[improved]
+        # Relax from the previous round's labels only, then commit
+        parents = src[live[best]]
+        new_legs = legs[parents] + 1
+        new_airline_sum = airline_sum[parents] + edges["airlines"][live[best]]
+        new_ground_only = ground_only[parents] & edges["ground"][live[best]]
+        time[targets] = cand_time[best]
+        distance[targets] = cand_distance[best]
+        co2[targets] = cand_co2[best]
+        legs[targets] = new_legs
+        airline_sum[targets] = new_airline_sum
+        ground_only[targets] = new_ground_only
+        entry[round_index, targets] = live[best]
+
+    tree = {
+        "origin": origin_index,
+        "reverse": reverse,
+        "time": time,
+        "distance": distance,
+        "co2": co2,
+        "legs": legs,
+        "airline_sum": airline_sum,
+        "ground_only": ground_only,
+        "entry": entry,
+    }
+    tree["nbytes"] = sum(value.nbytes for value in tree.values() if isinstance(value, np.ndarray))
+    return tree
+
+
+def _tree_edges(edges, tree, index):
+    # Edge indices on the tree path between the root and `index`, in travel order
+    entry = tree["entry"]
+    parent = edges["dst"] if tree["reverse"] else edges["src"]
+    path = []
+    current = index
+    # Walk back through the rounds: an airport's label at round k was entered by
+    # the latest edge recorded for it at or before round k
+    round_index = entry.shape[0] - 1
+    while current != tree["origin"]:
+        edge = int(entry[round_index, current])
+        round_index -= 1
+        if edge < 0:
+            continue
+        path.append(edge)
+        current = int(parent[edge])
+    if not tree["reverse"]:
+        path.reverse()
+    return path
+
+
+def _route_detail(edges, path, distance, time, co2, layover_minutes):
+    codes = edges["codes"]
+    segments = tuple(
+        RouteSegment(
+            codes[int(edges["src"][edge])],
+            codes[int(edges["dst"][edge])],
+            float(edges["distance"][edge]),
+            float(edges["time"][edge]),
+            int(edges["airlines"][edge]),
+        )
+        for edge in path
+    )
+    stops = len(segments) - 1
+    ground_only = bool(edges["ground"][path].all())
+    return RouteDetail(
+        "ground" if ground_only else STOP_AVAILABILITY[min(stops, len(STOP_AVAILABILITY) - 1)],
+        len(segments),
+        stops,
+        tuple([segments[0].origin] + [segment.dest for segment in segments]),
+        segments,
+        float(distance),
+        float(time),
+        float(co2),
+        round(sum(segment.airlines for segment in segments) / len(segments), 3),
+        layover_minutes=stops * layover_minutes,
+    )
+
+
+def TreeRoute(edges, tree, dest, layover_minutes):
+    """RouteDetail for `dest` from a tree built by BuildTree, or None if unreachable."""
+    dest_index = edges["index"].get(dest)
+    if dest_index is None or not np.isfinite(tree["time"][dest_index]) or dest_index == tree["origin"]:
+        return None
+    return _route_detail(
+        edges,
+        _tree_edges(edges, tree, dest_index),
+        tree["distance"][dest_index],
+        tree["time"][dest_index],
+        tree["co2"][dest_index],
+        layover_minutes,
+    )
+
+
+def MeetRoute(edges, forward, backward, layover_minutes):
+    """Fastest itinerary joining a forward tree (from the origin) and a reverse tree (to the destination).
+
+    Any itinerary with at most a + b legs splits into at most a legs from the
+    origin and at most b legs to the destination, so the best itinerary is the
+    best meeting airport m of forward[m] + layover + backward[m]. Deep stop
+    limits therefore cost two shallow trees and one vector scan instead of an
+    exponentially growing search. Returns None if the trees never meet.
+    """
+    origin_index = forward["origin"]
+    dest_index = backward["origin"]
+    if origin_index == dest_index:
+        return None
+    layover = np.full(len(forward["time"]), layover_minutes)
+    layover[[origin_index, dest_index]] = 0.0
+    total = forward["time"] + backward["time"] + layover
+    best = total.min()
+    if not np.isfinite(best):
+        return None
+    # Ties on time prefer the shorter distance, as in the forward tree
+    ties = np.flatnonzero(total <= best + 1e-6)
+    distance = forward["distance"][ties] + backward["distance"][ties]
+    meet = int(ties[np.argmin(distance)])
+    path = _tree_edges(edges, forward, meet) + _tree_edges(edges, backward, meet)
+    return _route_detail(
+        edges,
+        path,
+        forward["distance"][meet] + backward["distance"][meet],
+        total[meet],
+        forward["co2"][meet] + backward["co2"][meet],
+        layover_minutes,
+    )
@@ -0,0 +1,152 @@
+import itertools
+import math
+
+import numpy as np
+
+from modules import fairness
+
+_EXACT_MAX_COMBINATIONS = 500000
+_EXACT_CHUNK = 20000
+_MAX_SWAP_ROUNDS = 50
+
+
+def _assignment_cost(cost, weights, chosen):
+    return float(cost[list(chosen)].min(axis=0) @ weights)
+
+
+def GreedyVenues(cost, weights, k):
+    """k-median heuristic: greedy opening followed by single-swap local search.
+
+    `cost` is a (candidates x origins) matrix and `weights` the attendees per
+    origin. Each round of the swap phase tries replacing every open venue with
+    every closed candidate (one matrix product per open venue) and applies the
+    best improving swap. Returns the chosen row indices.
+    """
+    count = cost.shape[0]
+    k = min(k, count)
+    chosen = []
+    best = np.full(cost.shape[1], np.inf)
+    for _ in range(k):
+        totals = np.minimum(cost, best) @ weights
+        totals[chosen] = np.inf
+        pick = int(np.argmin(totals))
+        chosen.append(pick)
+        best = np.minimum(best, cost[pick])
+
+    current = _assignment_cost(cost, weights, chosen)
+    for _ in range(_MAX_SWAP_ROUNDS):
+        best_swap = None
+        best_total = current - 1e-9
+        for position in range(len(chosen)):
+            others = chosen[:position] + chosen[position + 1:]
+            rest = cost[others].min(axis=0) if others else np.full(cost.shape[1], np.inf)
+            totals = np.minimum(cost, rest) @ weights
+            totals[chosen] = np.inf
+            pick = int(np.argmin(totals))
+            if totals[pick] < best_total:
+                best_total = float(totals[pick])
+                best_swap = (position, pick)
+        if best_swap is None:
+            break
+        chosen[best_swap[0]] = best_swap[1]
+        current = best_total
+    return sorted(chosen, key=lambda row: _assignment_cost(cost, weights, [row]))
+
+
+def ExactVenues(cost, weights, k, max_combinations=_EXACT_MAX_COMBINATIONS):
+    """Optimal k venues by enumerating every combination, or None if there are too many."""
+    count = cost.shape[0]
+    k = min(k, count)
+    if k <= 0 or math.comb(count, k) > max_combinations:
+        return None
+    best_total = np.inf
+    best = None
+    combinations = itertools.combinations(range(count), k)
+    while True:
+        chunk = np.array(list(itertools.islice(combinations, _EXACT_CHUNK)), dtype=np.int64)
+        if not len(chunk):
+            break
+        totals = cost[chunk].min(axis=1) @ weights
+        index = int(np.argmin(totals))
+        if totals[index] < best_total:
+            best_total = float(totals[index])
+            best = chunk[index].tolist()
+    return sorted(best, key=lambda row: _assignment_cost(cost, weights, [row]))
+
+
+def SelectVenues(metrics, k, objective="time", exact=None):
+    """Choose `k` venues from a metric matrix, sending each origin to its cheapest venue.
+
+    `objective` is the matrix to minimise ("time", "co2" or "distance"), summed
+    over attendees. `exact` forces (True) or disables (False) exhaustive search;
+    by default it is used whenever the number of combinations is small enough.
+
+    `k` must be at least 1; a `k` above the number of candidates is capped at
+    that number.
+
+    Returns a dict with the venue codes, the venue chosen per origin, per-venue
+    and overall totals, and the solver used.
+    """
+    k = int(k)
+    if k < 1:
+        raise ValueError(f"Number of venues must be at least 1, got {k}")
+    cost = metrics[objective]
+    if cost.shape[0] == 0:
+        raise ValueError("No candidates to choose venues from")
+    k = min(k, cost.shape[0])
+    weights = metrics["weights"]
+    rows = None
+    solver = "greedy"
+    if exact is not False:
+        rows = ExactVenues(cost, weights, k)
+        if rows is not None:
+            solver = "exact"
+        elif exact:
+            raise ValueError(f"Too many venue combinations for an exact search (k={k}, candidates={cost.shape[0]})")
+    if rows is None:
+        rows = GreedyVenues(cost, weights, k)
+
+    assigned = np.array(rows)[np.argmin(cost[rows], axis=0)]
+    columns = np.arange(cost.shape[1])
+    times = metrics["time"][assigned, columns]
+    co2 = metrics["co2"][assigned, columns]
+    distance = metrics["distance"][assigned, columns]
+    burden = fairness.FairnessStats({"time": times[None, :], "co2": co2[None, :], "weights": weights})
+
+    venues = []
+    for row in rows:
+        mask = assigned == row
+        attendees = float(weights[mask].sum())
+        share = fairness.FairnessStats(
+            {"time": times[None, mask], "co2": co2[None, mask], "weights": weights[mask]}
+        )
+        venues.append(
+            {
+                "code": metrics["codes"][row],
+                "origins": [origin for origin, keep in zip(metrics["origins"], mask) if keep],
+                "attendees": attendees,
+                "mean_time": float(times[mask] @ weights[mask] / attendees) if attendees else 0.0,
+                "max_time": float(share["max_time"][0]),
+                "p90_time": float(share["p90_time"][0]),
+                "gini_time": float(share["gini_time"][0]),
+                "total_co2": float(co2[mask] @ weights[mask]),
+                "total_distance": float(distance[mask] @ weights[mask]),
+            }
+        )
+    total_attendees = float(weights.sum())
+    return {
+        "venues": venues,
+        "assignment": {origin: metrics["codes"][row] for origin, row in zip(metrics["origins"], assigned)},
+        "objective": objective,
+        "cost": float(cost[assigned, columns] @ weights),
+        "solver": solver,
+        "totals": {
+            "attendees": total_attendees,
+            "mean_time": float(times @ weights / total_attendees) if total_attendees else 0.0,
+            "total_co2": float(co2 @ weights),
+            "total_distance": float(distance @ weights),
+            "max_time": float(burden["max_time"][0]),
+            "p90_time": float(burden["p90_time"][0]),
+            "gini_time": float(burden["gini_time"][0]),
+        },
+    }
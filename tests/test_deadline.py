@@ -0,0 +1,22 @@
+import time
+
+import pytest
+
+from modules import backend
+
+_MARGIN_SECONDS = 0.1
+
+
+@pytest.mark.parametrize("max_stops", [None, 4])
+@pytest.mark.parametrize("deadline", [0.05, 0.1, 0.3])
+def test_compute_top10_returns_within_deadline(deadline, max_stops):
+    backend._get_dataset()
+    backend.clear_search_caches()
+    started = time.monotonic()
+    rows, meta = backend.compute_top10(
+        ["FRA", "CDG", "MAD", "SFO", "SYD", "DEL", "PEK", "YYZ"], max_stops=max_stops, deadline=deadline
+    )
+    assert time.monotonic() - started <= deadline + _MARGIN_SECONDS
+    assert len(rows) <= meta["evaluated"] <= meta["candidates"]
+    if not meta["complete"]:
+        assert meta["query_key"] not in backend._RESULT_CACHE
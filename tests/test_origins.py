@@ -0,0 +1,14 @@
+import pytest
+
+from modules import backend
+
+
+@pytest.mark.parametrize("weight", ["nan", "inf", "-inf", 0, -1])
+def test_validate_origins_rejects_bad_weights(weight):
+    airports = backend._get_dataset()["airports"]
+    assert backend.ValidateOrigins([("LHR", 1.0), ("JFK", float(weight))], airports) is False
+
+
+def test_validate_origins_accepts_fractional_weights():
+    airports = backend._get_dataset()["airports"]
+    assert backend.ValidateOrigins([("LHR", 0.5), ("JFK", 2.5)], airports) == [("LHR", 0.5), ("JFK", 2.5)]
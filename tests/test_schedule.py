@@ -0,0 +1,13 @@
+import pytest
+
+from modules import schedule
+
+
+@pytest.mark.parametrize("value", ["Tue 09:00", "Tue 09:00 UTC", "tue 09:00 utc", "Tuesday 09:00UTC"])
+def test_parse_week_time_accepts_optional_utc(value):
+    assert schedule.ParseWeekTime(value) == 24 * 60 + 9 * 60
+
+
+def test_parse_week_time_rejects_other_zones():
+    with pytest.raises(ValueError):
+        schedule.ParseWeekTime("Tue 09:00 CET")
@@ -0,0 +1,19 @@
+from modules import backend
+
+
+def _codes(rows):
+    return [row[0] for row in rows]
+
+
+def test_compute_top10_after_session_edit_matches_cold_run():
+    backend.clear_search_caches()
+    cold, _ = backend.compute_top10(["LHR", "JFK", "NRT"])
+
+    backend.clear_search_caches()
+    session = backend.EvaluationSession()
+    session.update(["LHR", "JFK", "NRT", "SYD"])
+    session.update(["LHR", "JFK", "NRT"])
+    rows, _ = backend.compute_top10(["LHR", "JFK", "NRT"])
+
+    assert _codes(rows) == _codes(cold)
+    assert [row[2] for row in rows] == [row[2] for row in cold]